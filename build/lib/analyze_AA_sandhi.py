@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Dec  8 22:23:58 2025
+
+@author: xuechandai
+"""
+
+import os
+import pandas as pd
+import numpy as np
+
+from derive_sandhi_with_manual_tones import add_base_label_and_index
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "f0_with_T_values_labeled.csv")
+OUTPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "AA_sandhi_all_words.csv")
+
+
+def analyze_aa_sandhi(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Print the majority AA sandhi pattern of every reduplicated word and the
+    meaning contrasts (meaning tier, or index > 2); return the per-word patterns.
+    """
+    df = df.copy()
+
+    # If base_label / index do not exist, derive them from the word tier
+    # columns or the 'syllable' label
+    if "base_label" not in df.columns or "index" not in df.columns:
+        df = add_base_label_and_index(df)
+
+    # ---------------------------------------------
+    # 1. Identify all AA words based on base_label
+    #    A1 = index 1; A2 = index 2
+    # ---------------------------------------------
+
+    print("\n=========== FULL AA SANDHI ANALYSIS ===========\n")
+
+    AA_labels = df[df["index"].isin([1, 2])]["base_label"].unique()
+
+    results = []
+
+    for lbl in AA_labels:
+        sub = df[(df["base_label"] == lbl) & (df["index"].isin([1, 2]))]
+
+        if sub.empty:
+            continue
+
+        A1 = sub[sub["index"] == 1]
+        A2 = sub[sub["index"] == 2]
+
+        if A1.empty or A2.empty:
+            continue
+
+        tone_A1 = A1["tone_5deg"].value_counts().idxmax()
+        tone_A2 = A2["tone_5deg"].value_counts().idxmax()
+
+        results.append({
+            "word": lbl + lbl,
+            "base_label": lbl,
+            "A1_tone": tone_A1,
+            "A2_tone": tone_A2,
+            "sandhi_pattern": f"{tone_A1}→{tone_A2}"
+        })
+
+        print(f"{lbl}{lbl}:  A1={tone_A1},  A2={tone_A2},  pattern={tone_A1}→{tone_A2}")
+
+    # --------------------------------------------------------
+    # 2. Detect words with multiple meanings: from the meaning
+    #    tier if it was annotated, otherwise index > 2
+    # --------------------------------------------------------
+
+    print("\n=========== MEANING-CONDITIONAL SANDHI CHECK ===========\n")
+
+    if "meaning" in df.columns and df["meaning"].notna().any():
+        meaning_col = "meaning"
+        n_meanings = df.dropna(subset=["meaning"]).groupby("base_label")["meaning"].nunique()
+        special = n_meanings[n_meanings > 1].index
+    else:
+        meaning_col = "index"
+        special = df[df["index"] > 2]["base_label"].unique()
+
+    for lbl in special:
+        sub = df[df["base_label"] == lbl]
+
+        print(f"\n>> Meaning contrast detected for {lbl}:")
+        print(sub[["syllable", meaning_col, "tone_5deg", "T_start", "T_end"]])
+
+        print("\nTone distribution by meaning:")
+        print(sub.groupby(meaning_col)["tone_5deg"].value_counts())
+
+    return pd.DataFrame(results)
+
+
+def main():
+    # Read the original labeled file
+    df = pd.read_csv(INPUT_CSV)
+
+    out = analyze_aa_sandhi(df)
+    out.to_csv(OUTPUT_CSV, index=False, encoding="utf-8-sig")
+    print(f"\nSaved AA sandhi patterns to {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 16:48:05 2026
+
+@author: xuechandai
+"""
+
+"""
+Check which stimulus items every speaker actually produced.
+
+The stimulus list (one item per line, syllables separated by spaces, an
+optional gloss in parentheses, section headings without Chinese
+characters) is parsed once into an index of expected syllables:
+
+    item           婆婆（grandma）
+    syllable       婆
+    n_expected     2
+
+Extracted tokens are counted per speaker and base syllable, and the counts
+are joined to the index in one hash join on the syllable, so the check
+costs O(tokens + expected syllables) for any number of speakers and items.
+An item's coverage is the share of its syllables found (1.0 = complete).
+
+Speakers annotated with a word tier (word / meaning columns of
+extract_f0_from_textgrid.py) are matched on whole words instead: an item
+is covered if the speaker has a word with the same syllables and, when
+both are known, the same meaning as the item's gloss.
+
+The gate keeps only speakers who completed at least MIN_COVERAGE of the
+items; GATE_ACTION = "stop" aborts instead of dropping them.
+
+Outputs:
+    data/processed/stimulus_coverage.csv            speaker x item matrix
+    data/processed/stimulus_coverage_speakers.csv   one row per speaker
+"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from derive_sandhi_with_manual_tones import add_base_label_and_index
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STIMULI_TXT = os.path.join(PROJECT_ROOT, "data", "raw", "stimuli", "guiyang_tone_stimuli.txt")
+INPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "f0_with_T_values.csv")
+MATRIX_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "stimulus_coverage.csv")
+SPEAKERS_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "stimulus_coverage_speakers.csv")
+
+# Share of items a speaker must have completed to pass the gate
+MIN_COVERAGE = 1.0
+GATE_ACTION = "drop"   # "drop" incomplete speakers or "stop" the pipeline
+
+CJK = re.compile(r"[㐀-鿿]")
+GLOSS = re.compile(r"[(（](.*?)[)）]")
+
+# ======================================================
+
+
+def load_stimuli(path: str = STIMULI_TXT) -> pd.DataFrame:
+    """One row per distinct item: item, section, word (syllables joined), gloss, syllables."""
+    rows, section = [], None
+    with open(path, encoding="utf-8-sig") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            if not CJK.search(line):
+                section = line
+                continue
+            match = GLOSS.search(line)
+            gloss = match.group(1).strip() if match else None
+            syllables = GLOSS.sub("", line).split()
+            word = "".join(syllables)
+            rows.append({"item": word + (f"（{gloss}）" if gloss else ""),
+                         "section": section, "word": word, "gloss": gloss,
+                         "syllables": syllables})
+
+    items = pd.DataFrame(rows, columns=["item", "section", "word", "gloss", "syllables"])
+    return items.drop_duplicates("item").reset_index(drop=True)
+
+
+class StimulusIndex:
+    """Expected syllables (and words) of a stimulus list, keyed for hash joins."""
+
+    def __init__(self, items: pd.DataFrame):
+        self.items = items
+        expected = (items[["item", "syllables"]].explode("syllables")
+                    .rename(columns={"syllables": "syllable"}))
+        self.expected = (expected.groupby(["item", "syllable"], sort=False).size()
+                         .rename("n_expected").reset_index())
+        self.n_syllables = items.set_index("item")["syllables"].str.len()
+
+    @classmethod
+    def from_file(cls, path: str = STIMULI_TXT) -> "StimulusIndex":
+        return cls(load_stimuli(path))
+
+    def _syllable_coverage(self, tokens: pd.DataFrame) -> pd.DataFrame:
+        observed = (tokens.groupby(["speaker", "base_label"], sort=False).size()
+                    .rename("n_found").reset_index()
+                    .rename(columns={"base_label": "syllable"}))
+        hits = observed.merge(self.expected, on="syllable")
+        hits["n_found"] = np.minimum(hits["n_found"], hits["n_expected"])
+        found = hits.groupby(["speaker", "item"], sort=False)["n_found"].sum()
+        n_expected = self.n_syllables.reindex(found.index.get_level_values("item")).to_numpy()
+        return (found / n_expected).rename("coverage").reset_index()
+
+    def _word_coverage(self, tokens: pd.DataFrame) -> pd.DataFrame:
+        words = tokens.drop_duplicates(["speaker", "word_id"])
+        words = words.assign(word=words["word"].astype(str).str.replace(r"\s+", "", regex=True))
+        hits = words[["speaker", "word", "meaning"]].merge(
+            self.items[["item", "word", "gloss"]], on="word")
+        same_meaning = hits["gloss"].isna() | hits["meaning"].isna() | (hits["meaning"] == hits["gloss"])
+        hits = hits[same_meaning].drop_duplicates(["speaker", "item"])
+        return hits[["speaker", "item"]].assign(coverage=1.0)
+
+    def coverage(self, tokens: pd.DataFrame) -> pd.DataFrame:
+        """
+        Speaker x item matrix of coverage (0-1) for the tokens of
+        f0_with_T_values.csv. Every item is a column, every speaker a row.
+        """
+        tokens = tokens[tokens["syllable"].notna()].copy()
+        tokens["speaker"] = tokens["speaker"].astype(str)
+        if "word" not in tokens.columns:
+            tokens["word"], tokens["word_id"], tokens["meaning"] = None, np.nan, None
+        tokens = add_base_label_and_index(tokens)
+
+        # Speakers with a word tier are matched on words, the others on syllables
+        by_word = tokens.groupby("speaker")["word"].transform(lambda w: w.notna().any())
+        parts = [self._syllable_coverage(tokens[~by_word])]
+        if by_word.any():
+            annotated = tokens[by_word]
+            parts.append(self._word_coverage(annotated[annotated["word"].notna()]))
+
+        speakers = list(dict.fromkeys(tokens["speaker"]))
+        matrix = (pd.concat(parts).pivot(index="speaker", columns="item", values="coverage")
+                  .reindex(index=speakers, columns=self.items["item"]).fillna(0.0))
+        matrix.columns.name = None
+        matrix.index.name = "speaker"
+        return matrix
+
+
+def summarize_speakers(matrix: pd.DataFrame, min_coverage: float = MIN_COVERAGE) -> pd.DataFrame:
+    """One row per speaker: items complete / partial / missing and the gate decision."""
+    complete = matrix >= 1.0
+    missing = matrix <= 0.0
+    summary = pd.DataFrame({
+        "speaker": matrix.index,
+        "n_items": matrix.shape[1],
+        "n_complete": complete.sum(axis=1).to_numpy(),
+        "n_partial": (~complete & ~missing).sum(axis=1).to_numpy(),
+        "n_missing": missing.sum(axis=1).to_numpy(),
+    })
+    summary["share_complete"] = summary["n_complete"] / max(matrix.shape[1], 1)
+    summary["passes_gate"] = summary["share_complete"] >= min_coverage
+    summary["incomplete_items"] = ["; ".join(matrix.columns[~row]) for row in complete.to_numpy()]
+    return summary
+
+
+def gate_speakers(tokens: pd.DataFrame, summary: pd.DataFrame,
+                  action: str = GATE_ACTION) -> pd.DataFrame:
+    """
+    Tokens of the speakers that pass the gate. With action = "stop", or if
+    no speaker passes, raise SystemExit instead.
+    """
+    failed = summary.loc[~summary["passes_gate"]]
+    if failed.empty:
+        print(f"✅ All {len(summary)} speakers pass the stimulus coverage gate.")
+        return tokens
+
+    for row in failed.itertuples(index=False):
+        print(f"⚠ {row.speaker}: {row.n_complete}/{row.n_items} items complete; "
+              f"incomplete: {row.incomplete_items}")
+    if action == "stop":
+        raise SystemExit(f"{len(failed)} speaker(s) below the stimulus coverage gate; stopping.")
+    if action != "drop":
+        raise ValueError(f"GATE_ACTION must be 'drop' or 'stop', not {action!r}.")
+    if len(failed) == len(summary):
+        raise SystemExit("No speaker passes the stimulus coverage gate; nothing to process.")
+
+    keep = ~tokens["speaker"].astype(str).isin(failed["speaker"].astype(str))
+    print(f"Dropped {len(failed)} incomplete speaker(s) ({(~keep).sum()} tokens).")
+    return tokens.loc[keep].reset_index(drop=True)
+
+
+def check_coverage(tokens: pd.DataFrame, stimuli_path: str = STIMULI_TXT,
+                   min_coverage: float = MIN_COVERAGE):
+    """Return (matrix, summary) for the tokens against a stimulus list."""
+    index = StimulusIndex.from_file(stimuli_path)
+    matrix = index.coverage(tokens)
+    return matrix, summarize_speakers(matrix, min_coverage)
+
+
+def save_coverage(matrix: pd.DataFrame, summary: pd.DataFrame):
+    matrix.to_csv(MATRIX_CSV, encoding="utf-8-sig")
+    summary.to_csv(SPEAKERS_CSV, index=False, encoding="utf-8-sig")
+    print(f"Saved: {MATRIX_CSV}")
+    print(f"Saved: {SPEAKERS_CSV}")
+
+
+def main():
+    matrix, summary = check_coverage(pd.read_csv(INPUT_CSV), STIMULI_TXT, MIN_COVERAGE)
+    save_coverage(matrix, summary)
+
+    print(f"\n=== Stimulus coverage ({os.path.basename(STIMULI_TXT)}, "
+          f"{matrix.shape[1]} items) ===")
+    print(summary.drop(columns="incomplete_items").round(3).to_string(index=False))
+    n_failed = int((~summary["passes_gate"]).sum())
+    if n_failed:
+        print(f"\n⚠ {n_failed} speaker(s) below MIN_COVERAGE = {MIN_COVERAGE:g}")
+    else:
+        print(f"\n✅ All speakers pass MIN_COVERAGE = {MIN_COVERAGE:g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Dec  9 14:09:15 2025
+
+@author: xuechandai
+"""
+
+"""
+Compare simulated and empirical AA surface tones.
+
+Besides the pooled proportion plot, every (citation tone, position) cell
+is scored with chi-square, Jensen–Shannon and total-variation distances
+between the empirical and simulated surface-tone distributions. All cells
+are computed at once from dense count arrays (cell x surface tone).
+
+p-values come from permutation tests: shuffling the empirical / simulated
+labels of a cell's pooled tokens only changes which tokens land in the
+empirical group, so each shuffle is drawn directly as a multivariate
+hypergeometric sample of the pooled counts. Shuffles are split over
+worker processes.
+
+Outputs (data/figures/):
+    sim_vs_empirical.png
+    sim_vs_empirical_stats.csv
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIM_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "sandhi_simulation.csv")
+EMP_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "kinship_tones_with_sandhi_info.csv")
+FIG_DIR = os.path.join(PROJECT_ROOT, "data", "figures")
+FIG_PATH = os.path.join(FIG_DIR, "sim_vs_empirical.png")
+STATS_CSV = os.path.join(FIG_DIR, "sim_vs_empirical_stats.csv")
+
+N_PERMUTATIONS = 10000
+N_JOBS = os.cpu_count() or 1
+
+# Keep AA kinship only
+KINSHIP = ["爸","妈","姐","妹","哥","弟","爷","奶","公","姑","叔","婆","祖","舅","伯"]
+
+
+def plot_sim_vs_empirical(sim: pd.DataFrame, emp: pd.DataFrame, fig_path: str = FIG_PATH):
+    """Plot pooled normalized surface-tone proportions, empirical vs simulated."""
+    import matplotlib.pyplot as plt
+
+    emp = emp[(emp["base_label"].isin(KINSHIP)) & (emp["index"].isin([1,2]))].copy()
+
+    # Convert type
+    emp["surface_tone"] = emp["surface_tone"].astype(int)
+
+    # Count real distribution
+    emp_counts = emp["surface_tone"].value_counts().sort_index()
+    sim_counts = sim["surface"].value_counts().sort_index()
+
+    # Normalize
+    emp_norm = emp_counts / emp_counts.sum()
+    sim_norm = sim_counts / sim_counts.sum()
+
+    plt.figure(figsize=(6,4))
+    plt.plot(emp_norm.index, emp_norm.values, marker="o", label="Empirical")
+    plt.plot(sim_norm.index, sim_norm.values, marker="s", label="Simulated")
+
+    plt.xlabel("Surface tone category")
+    plt.ylabel("Proportion")
+    plt.title("Empirical vs Simulated Surface Tone Distribution")
+    plt.legend()
+    plt.tight_layout()
+
+    os.makedirs(os.path.dirname(fig_path), exist_ok=True)
+    plt.savefig(fig_path, dpi=300)
+    plt.close()
+
+    print(f"Saved: {fig_path}")
+
+
+def contingency_tables(sim: pd.DataFrame, emp: pd.DataFrame):
+    """
+    Count surface tones per (citation, position) cell.
+
+    Returns (cells, surface_tones, emp_counts, sim_counts) where cells is
+    a list of (citation, position) pairs and both count arrays have shape
+    (len(cells), len(surface_tones)).
+    """
+    emp = emp[(emp["base_label"].isin(KINSHIP)) & (emp["index"].isin([1,2]))]
+    emp_cp = np.column_stack([emp["citation_tone"].astype(int), emp["index"].astype(int)])
+    sim_cp = sim[["citation", "position"]].to_numpy(dtype=int)
+    emp_s = emp["surface_tone"].to_numpy(dtype=int)
+    sim_s = sim["surface"].to_numpy(dtype=int)
+
+    cells, cell_idx = np.unique(np.vstack([emp_cp, sim_cp]), axis=0, return_inverse=True)
+    tones, tone_idx = np.unique(np.concatenate([emp_s, sim_s]), return_inverse=True)
+    cell_idx = cell_idx.ravel()
+    K, S = len(cells), len(tones)
+
+    flat = cell_idx * S + tone_idx
+    n_emp = len(emp_s)
+    emp_counts = np.bincount(flat[:n_emp], minlength=K * S).reshape(K, S)
+    sim_counts = np.bincount(flat[n_emp:], minlength=K * S).reshape(K, S)
+    return [tuple(c) for c in cells], tones, emp_counts, sim_counts
+
+
+def distribution_distances(a, b):
+    """
+    Chi-square (homogeneity), Jensen–Shannon (base 2) and total-variation
+    distance between count arrays a and b along the last axis. Leading axes
+    (cells, permutations) are broadcast. Empty distributions give NaN.
+    """
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    na = a.sum(axis=-1, keepdims=True)
+    nb = b.sum(axis=-1, keepdims=True)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = a / na
+        q = b / nb
+
+        # Chi-square test of homogeneity on the 2 x S table
+        col = a + b
+        total = na + nb
+        ea = col * na / total
+        eb = col * nb / total
+        chi2 = (np.where(ea > 0, (a - ea) ** 2 / ea, 0.0)
+                + np.where(eb > 0, (b - eb) ** 2 / eb, 0.0)).sum(axis=-1)
+
+        m = 0.5 * (p + q)
+        kl_pm = np.where(p > 0, p * np.log2(p / m), 0.0).sum(axis=-1)
+        kl_qm = np.where(q > 0, q * np.log2(q / m), 0.0).sum(axis=-1)
+        jsd = 0.5 * (kl_pm + kl_qm)
+
+        tv = 0.5 * np.abs(p - q).sum(axis=-1)
+
+    empty = (na[..., 0] == 0) | (nb[..., 0] == 0)
+    return {
+        "chi2": np.where(empty, np.nan, chi2),
+        "jsd": np.where(empty, np.nan, jsd),
+        "tv": np.where(empty, np.nan, tv),
+    }
+
+
+def _permutation_worker(args):
+    """Count, per cell and statistic, shuffles at least as extreme as observed."""
+    emp_counts, sim_counts, observed, n_permutations, seed = args
+    rng = np.random.default_rng(seed)
+    exceed = {name: np.zeros(len(emp_counts), dtype=np.int64) for name in observed}
+
+    for k in range(len(emp_counts)):
+        n_emp = emp_counts[k].sum()
+        if n_emp == 0 or sim_counts[k].sum() == 0:
+            continue
+        pooled = emp_counts[k] + sim_counts[k]
+        # One row per shuffle: which of the pooled tokens end up "empirical"
+        perm_emp = rng.multivariate_hypergeometric(pooled, n_emp, size=n_permutations)
+        stats = distribution_distances(perm_emp, pooled - perm_emp)
+        for name, value in stats.items():
+            # Small tolerance so ties from float rounding count as extreme
+            exceed[name][k] = np.count_nonzero(value >= observed[name][k] - 1e-12)
+    return exceed
+
+
+def permutation_pvalues(emp_counts, sim_counts, observed,
+                        n_permutations=N_PERMUTATIONS, n_jobs=N_JOBS, seed=None):
+    """Permutation p-values (with the +1 correction) for every cell and statistic."""
+    n_jobs = max(1, min(n_jobs, n_permutations))
+    sizes = [len(part) for part in np.array_split(np.arange(n_permutations), n_jobs)]
+    seeds = np.random.SeedSequence(seed).spawn(n_jobs)
+    tasks = [(emp_counts, sim_counts, observed, size, s) for size, s in zip(sizes, seeds)]
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            parts = list(pool.map(_permutation_worker, tasks))
+    else:
+        parts = [_permutation_worker(tasks[0])]
+
+    return {
+        name: (1 + sum(part[name] for part in parts)) / (1 + n_permutations)
+        for name in observed
+    }
+
+
+def compare_distributions(sim: pd.DataFrame, emp: pd.DataFrame,
+                          n_permutations=N_PERMUTATIONS, n_jobs=N_JOBS,
+                          seed=None) -> pd.DataFrame:
+    """One row per (citation, position) cell with distances and permutation p-values."""
+    cells, _, emp_counts, sim_counts = contingency_tables(sim, emp)
+    observed = distribution_distances(emp_counts, sim_counts)
+    pvalues = permutation_pvalues(emp_counts, sim_counts, observed,
+                                  n_permutations, n_jobs, seed)
+
+    out = pd.DataFrame(cells, columns=["citation_tone", "position"])
+    out["n_empirical"] = emp_counts.sum(axis=1)
+    out["n_simulated"] = sim_counts.sum(axis=1)
+    for name in observed:
+        out[name] = observed[name]
+        out[f"{name}_p"] = np.where(np.isnan(observed[name]), np.nan, pvalues[name])
+    return out
+
+
+def main():
+    sim = pd.read_csv(SIM_CSV)
+    emp = pd.read_csv(EMP_CSV)
+    plot_sim_vs_empirical(sim, emp)
+
+    stats = compare_distributions(sim, emp)
+    stats.to_csv(STATS_CSV, index=False, encoding="utf-8-sig")
+
+    print(f"\n=== Simulated vs empirical by cell ({N_PERMUTATIONS} permutations) ===")
+    print(stats.round(4).to_string(index=False))
+    print(f"Saved: {STATS_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Dec  9 11:47:46 2025
+
+@author: xuechandai
+"""
+
+import os
+import pandas as pd
+import numpy as np
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "f0_with_T_values_labeled.csv")
+CITATION_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "citation_tone_summary.csv")
+OUTPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "kinship_tones_with_sandhi_info.csv")
+
+
+# Manual citation tones for kinship base characters (1–4)
+CITATION_TONES = {
+    "爸": 2,
+    "妈": 1,
+    "姐": 3,
+    "妹": 4,
+    "哥": 1,
+    "弟": 4,
+    "爷": 2,
+    "奶": 1,
+    "公": 1,
+    "姑": 1,
+    "叔": 2,
+    "婆": 2,
+    "祖": 3,
+    "舅": 4,
+    "伯": 2,
+}
+
+
+def build_canonical_map(cit: pd.DataFrame) -> dict:
+    """
+    Build a mapping from canonical 5-degree tones (from citation_tone_summary)
+    to 4-way tone categories, based on the four tone groups.
+    """
+    canonical_map = {}
+    # Expect columns: tone_group (e.g. "Tone1"), selected_tone (e.g. "55")
+    for _, row in cit.iterrows():
+        group_name = str(row["tone_group"])   # "Tone1", "Tone2", ...
+        selected = str(row["selected_tone"])  # e.g. "55", "35", "214" etc.
+        # Map Tone1 -> 1, Tone2 -> 2, ...
+        try:
+            tone_class = int(group_name.replace("Tone", ""))
+        except Exception:
+            continue
+        canonical_map[selected] = tone_class
+    return canonical_map
+
+
+def contour_to_category(tone_str: str, canonical_map: dict = None) -> int:
+    """
+    Map a 5-degree tone label (e.g. '22', '32', '11', '24', '33', '55', '42', '54', ...)
+    to a 4-way tone category (1–4).
+
+    Priority:
+    1) Direct rules you specified:
+       - 22, 32 -> 2
+       - 11     -> 4
+       - 24     -> 1
+       - 33,55  -> 1
+       - 42     -> 2
+       - 54     -> 3
+    2) If not covered above, check if it appears as a canonical pattern
+       in citation_tone_summary.csv (canonical_map).
+    3) If still unknown, raise an error so you can inspect that token.
+    """
+    if pd.isna(tone_str):
+        raise ValueError("NaN tone_5deg encountered where a contour is expected.")
+
+    s = str(tone_str).strip()
+
+    # 1) Explicit rules
+    if s in {"22", "32"}:
+        return 2
+    if s == "11":
+        return 4
+    if s == "24":
+        return 1
+    if s in {"33", "55"}:
+        return 1
+    if s == "42":
+        return 2
+    if s == "54":
+        return 3
+    if s == "21":        # this assignment is unsure but since i got error for this I will mannually assign it as 5
+        return 5
+    if s == "34":        # this assignment is unsure but since i got error for this I will mannually assign it as 5
+        return 5
+
+    # 2) Use canonical map from citation_tone_summary (if exists)
+    if canonical_map and s in canonical_map:
+        return canonical_map[s]
+
+    # 3) Unknown contour -> force manual check
+    raise ValueError(f"Unknown 5-degree contour '{s}' for mapping to 4-way tone category.")
+
+
+def add_base_label_and_index(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add base_label (syllable without digits) and index (position in a
+    reduplicated word, NaN for single syllables) to df in place.
+
+    Tokens extracted with a word tier carry word_id / position columns;
+    index is their position in the word (NaN if the word has one
+    syllable). Other tokens fall back to the digit suffix of the label:
+        "字1" -> base_label="字", index=1
+        "弟3" -> base_label="弟", index=3
+    """
+    df["syllable"] = df["syllable"].astype(str)
+    df["base_label"] = df["syllable"].str.replace(r"\d+", "", regex=True)
+    df["index"] = df["syllable"].str.extract(r"(\d+)$")[0]
+    df["index"] = df["index"].astype("Int64")  # allows NaN
+
+    if "word_id" in df.columns and "position" in df.columns:
+        in_word = df["word_id"].notna()
+        word_size = df.groupby(["speaker", "word_id"])["word_id"].transform("size")
+        position = df["position"].astype("Int64").where(word_size > 1)
+        df.loc[in_word, "index"] = position[in_word]
+    return df
+
+
+def derive_sandhi(df: pd.DataFrame, citation_summary: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Attach base_label / index / citation_tone / surface_tone to every token
+    of the labeled file.
+    """
+    df = add_base_label_and_index(df.copy())
+
+    if citation_summary is not None:
+        canonical_map = build_canonical_map(citation_summary)
+        print("Canonical tone map from citation_tone_summary:", canonical_map)
+    else:
+        print("WARNING: citation_tone_summary.csv not found; canonical_map will be empty.")
+        canonical_map = {}
+
+    # Attach citation_tone and surface_tone to each row
+    df["citation_tone"] = df["base_label"].map(CITATION_TONES).astype(float)
+    df["surface_tone"] = df["tone_5deg"].apply(contour_to_category, canonical_map=canonical_map)
+    return df
+
+
+def print_aa_check(df: pd.DataFrame):
+    """Quick check: AA positions (index = 1 / 2) for kinship characters."""
+    aa_df = df[df["index"].isin([1, 2]) & df["base_label"].isin(CITATION_TONES.keys())].copy()
+
+    print("\n=== Sample sandhi patterns (majority citation vs surface tone by base_label & position) ===\n")
+
+    if aa_df.empty:
+        print("No AA tokens with index 1/2 found. Check your labeling.")
+    else:
+        grouped = (
+            aa_df.groupby(["base_label", "index"])[["citation_tone", "surface_tone"]]
+            .agg(lambda x: x.value_counts().index[0])  # majority value
+            .reset_index()
+        )
+        print(grouped)
+
+
+def main():
+    # 1. Load the main labeled file
+    df = pd.read_csv(INPUT_CSV)
+
+    try:
+        cit = pd.read_csv(CITATION_CSV)
+    except FileNotFoundError:
+        cit = None
+
+    df = derive_sandhi(df, cit)
+
+    # 2. Save enriched file
+    df.to_csv(OUTPUT_CSV, index=False, encoding="utf-8-sig")
+    print(f"\nSaved enriched tone file with citation_tone and surface_tone:\n  {OUTPUT_CSV}")
+
+    print_aa_check(df)
+
+
+if __name__ == "__main__":
+    main()
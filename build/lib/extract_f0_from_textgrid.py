@@ -0,0 +1,737 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Dec  4 12:13:35 2025
+
+@author: xuechandai
+"""
+
+"""
+Extract F0 statistics from Sound + TextGrid files and convert them
+to T-values (Shí Fēng normalization method) for tone analysis.
+
+Directory layout (relative to this script):
+
+guiyang_tone_sandi/
+│
+├── data/
+│   ├── raw/
+│   │   ├── audio/      <-- WAV files (participant01.wav, etc.)
+│   │   └── textgrid/   <-- TextGrid files (participant01.TextGrid, etc.)
+│   └── processed/
+│       └── f0_csv/     <-- output CSV will be written here
+│
+└── src/
+    └── extract_f0_from_textgrid.py  <-- this script
+"""
+
+import os
+import glob
+import math
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+# parselmouth / textgrid are only needed when audio is actually processed,
+# so they are imported inside the functions that use them
+if TYPE_CHECKING:
+    import parselmouth
+    from textgrid import TextGrid
+
+
+# Project root = one level above this script's directory
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+AUDIO_DIR = os.path.join(PROJECT_ROOT, "data", "raw", "audio")
+TEXTGRID_DIR = os.path.join(PROJECT_ROOT, "data", "processed", "textgrid")
+OUTPUT_F0_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "f0_with_T_values.csv")
+PITCH_CACHE_DIR = os.path.join(PROJECT_ROOT, "data", "processed", "pitch_cache")
+
+# Name of the tier that contains the syllable intervals
+TIER_NAME = "syllable"
+# Optional tiers whose intervals enclose the syllables; each syllable gets
+# the word / meaning interval its midpoint falls into. A TextGrid without
+# these tiers is read as before (None = do not read the tier).
+WORD_TIER = "word"
+MEANING_TIER = "meaning"
+
+# F0 extraction parameters (tuned for a young adult female speaker)
+PITCH_FLOOR = 60.0      # Hz
+PITCH_CEILING = 450.0   # Hz
+PITCH_TIME_STEP = 0.005  # seconds (5 ms, fairly dense sampling)
+
+# Two-pass per-speaker pitch range: a coarse pass over decimated audio with
+# a wide range estimates each speaker's F0 quartiles, and the fine pass
+# then uses floor = 0.75 * q1 and ceiling = 1.5 * q3 (De Looze & Hirst).
+# Set ADAPTIVE_PITCH_RANGE = False to use PITCH_FLOOR / PITCH_CEILING.
+ADAPTIVE_PITCH_RANGE = True
+COARSE_PITCH_FLOOR = 50.0     # Hz
+COARSE_PITCH_CEILING = 700.0  # Hz
+COARSE_TIME_STEP = 0.02       # seconds
+COARSE_SAMPLE_RATE = 8000.0   # Hz, audio is decimated to about this rate
+MIN_VOICED_FRAMES = 20        # fall back to the fixed range below this
+OUTPUT_RANGES_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "speaker_pitch_ranges.csv")
+
+# Also write all pitch frames + a token index to one memory-mapped store
+# (see pitch_frame_store.py)
+WRITE_FRAME_STORE = True
+
+# Per-interval measures besides the F0 statistics, all computed from the
+# same loaded audio in the same pass over the intervals:
+#   "duration"       interval length (s)
+#   "voicing_ratio"  share of pitch frames in the interval that are voiced
+#   "intensity"      mean (energy-averaged) and max intensity (dB)
+FEATURES = ["duration", "voicing_ratio", "intensity"]
+INTENSITY_MIN_PITCH = 100.0   # Hz, Praat's default analysis window
+
+# ======================================================
+
+
+def get_tier(textgrid: "TextGrid", tier_name: str):
+    """Return the tier with the given name from a TextGrid."""
+    for tier in textgrid.tiers:
+        if tier.name == tier_name:
+            return tier
+    raise ValueError(f"Tier '{tier_name}' not found in the TextGrid.")
+
+
+def compute_pitch_track(sound: "parselmouth.Sound",
+                        pitch_floor: float = PITCH_FLOOR,
+                        pitch_ceiling: float = PITCH_CEILING,
+                        time_step: float = PITCH_TIME_STEP):
+    """Run Praat's pitch tracker and return (frame times, F0 values in Hz)."""
+    pitch = sound.to_pitch(
+        time_step=time_step,
+        pitch_floor=pitch_floor,
+        pitch_ceiling=pitch_ceiling,
+    )
+    return pitch.xs(), pitch.selected_array["frequency"]
+
+
+def _decimate(sound: "parselmouth.Sound", target_rate: float) -> "parselmouth.Sound":
+    """Cheap decimation by block averaging (also acts as a low-pass filter)."""
+    import parselmouth
+
+    factor = int(sound.sampling_frequency // target_rate)
+    if factor <= 1:
+        return sound
+    values = sound.values[0]
+    n = len(values) // factor * factor
+    return parselmouth.Sound(
+        values[:n].reshape(-1, factor).mean(axis=1),
+        sampling_frequency=sound.sampling_frequency / factor,
+        start_time=sound.xmin,
+    )
+
+
+def estimate_pitch_range(sound: "parselmouth.Sound") -> dict:
+    """
+    Coarse first pass: estimate a speaker's F0 quartiles on decimated audio
+    with a large time step and a wide candidate range, and derive a narrow
+    floor / ceiling for the fine pass (rounded to 5 Hz).
+    """
+    _, ys = compute_pitch_track(
+        _decimate(sound, COARSE_SAMPLE_RATE),
+        COARSE_PITCH_FLOOR, COARSE_PITCH_CEILING, COARSE_TIME_STEP,
+    )
+    voiced = ys[ys > 0]
+
+    if voiced.size < MIN_VOICED_FRAMES:
+        q1 = median = q3 = math.nan
+        floor, ceiling = PITCH_FLOOR, PITCH_CEILING
+    else:
+        q1, median, q3 = np.percentile(voiced, [25, 50, 75])
+        floor = max(COARSE_PITCH_FLOOR, 5.0 * math.floor(0.75 * q1 / 5.0))
+        ceiling = min(COARSE_PITCH_CEILING, 5.0 * math.ceil(1.5 * q3 / 5.0))
+
+    return {
+        "f0_q1": q1,
+        "f0_median": median,
+        "f0_q3": q3,
+        "n_voiced_frames": int(voiced.size),
+        "pitch_floor": floor,
+        "pitch_ceiling": ceiling,
+    }
+
+
+def _get_sound(audio_path: str, sound):
+    """sound may be a loaded parselmouth.Sound, a function returning one, or None."""
+    if callable(sound):
+        return sound()
+    if sound is None:
+        import parselmouth
+        return parselmouth.Sound(audio_path)
+    return sound
+
+
+def _cached_track(cache_path: str, audio_path: str, compute):
+    """(xs, ys) from an .npz cache, recomputed when missing or older than the audio."""
+    if (os.path.exists(cache_path)
+            and os.path.getmtime(cache_path) >= os.path.getmtime(audio_path)):
+        cached = np.load(cache_path)
+        return cached["xs"], cached["ys"]
+
+    xs, ys = compute()
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    np.savez(cache_path, xs=xs, ys=ys)
+    return xs, ys
+
+
+def load_pitch_track(audio_path: str,
+                     pitch_floor: float = PITCH_FLOOR,
+                     pitch_ceiling: float = PITCH_CEILING,
+                     time_step: float = PITCH_TIME_STEP,
+                     cache_dir: str = PITCH_CACHE_DIR,
+                     sound: "parselmouth.Sound" = None):
+    """
+    Return (xs, ys) for one audio file and pitch setting.
+
+    Tracks are cached as .npz files in cache_dir (one per file and
+    floor / ceiling / time step), and recomputed only when the audio file
+    is newer than the cache. `sound` (a Sound or a function returning one)
+    avoids reading the audio again when it is already loaded.
+    """
+    basename = os.path.splitext(os.path.basename(audio_path))[0]
+    cache_path = os.path.join(
+        cache_dir, f"{basename}_{pitch_floor:g}_{pitch_ceiling:g}_{time_step:g}.npz"
+    )
+    return _cached_track(cache_path, audio_path, lambda: compute_pitch_track(
+        _get_sound(audio_path, sound), pitch_floor, pitch_ceiling, time_step))
+
+
+def load_intensity_track(audio_path: str,
+                         min_pitch: float = INTENSITY_MIN_PITCH,
+                         time_step: float = PITCH_TIME_STEP,
+                         cache_dir: str = PITCH_CACHE_DIR,
+                         sound: "parselmouth.Sound" = None):
+    """Return (frame times, intensity in dB), cached like load_pitch_track."""
+    basename = os.path.splitext(os.path.basename(audio_path))[0]
+    cache_path = os.path.join(
+        cache_dir, f"{basename}_intensity_{min_pitch:g}_{time_step:g}.npz"
+    )
+
+    def compute():
+        intensity = _get_sound(audio_path, sound).to_intensity(
+            minimum_pitch=min_pitch, time_step=time_step)
+        return intensity.xs(), intensity.values[0]
+
+    return _cached_track(cache_path, audio_path, compute)
+
+
+# Per-interval F0 statistics, in the order they are stored in TokenTable
+STAT_COLUMNS = ["f0_mean", "f0_min", "f0_max", "f0_start", "f0_end"]
+
+
+def _pitch_stats_into(xs, ys, t_start: float, t_end: float, out):
+    """
+    Write the STAT_COLUMNS values for one interval into `out` (any
+    length-5 array or view). Entries that cannot be computed are NaN.
+    """
+    out[:] = math.nan
+
+    # Frame times are sorted, so each time window is a contiguous slice
+    def window(t0, t1):
+        lo = np.searchsorted(xs, t0, side="left")
+        hi = np.searchsorted(xs, t1, side="right")
+        vals = ys[lo:hi]
+        return vals[vals > 0]  # voiced only
+
+    # All voiced frames within the interval
+    vals_all = window(t_start, t_end)
+
+    if vals_all.size == 0:
+        # Entire interval unvoiced
+        return
+
+    # Robust central tendency: trim extremes, then use median
+    q25, q75 = np.percentile(vals_all, [25, 75])
+    stable_vals = vals_all[(vals_all >= q25) & (vals_all <= q75)]
+    if stable_vals.size == 0:
+        stable_vals = vals_all
+
+    out[0] = np.median(stable_vals)
+    out[1] = np.min(vals_all)
+    out[2] = np.max(vals_all)
+
+    # Now compute start / end F0 using the first / last third
+    dur = t_end - t_start
+    if dur <= 0:
+        return
+
+    t_first_third_end = t_start + dur / 3.0
+    t_last_third_start = t_start + 2.0 * dur / 3.0
+
+    vals_start = window(t_start, t_first_third_end)
+    vals_end = window(t_last_third_start, t_end)
+
+    if vals_start.size > 0:
+        out[3] = np.median(vals_start)
+    if vals_end.size > 0:
+        out[4] = np.median(vals_end)
+
+
+# Extra per-interval columns of each feature in FEATURES
+FEATURE_COLUMNS = {
+    "duration": ["duration"],
+    "voicing_ratio": ["voicing_ratio"],
+    "intensity": ["intensity_mean", "intensity_max"],
+}
+
+
+def _features_into(features, t_start: float, t_end: float, pitch, intensity, out):
+    """
+    Write the columns of `features` (in FEATURE_COLUMNS order) for one
+    interval into `out`. pitch / intensity are (xs, ys) tracks; intensity
+    may be None if "intensity" is not requested.
+    """
+    j = 0
+    for feature in features:
+        if feature == "duration":
+            out[j] = t_end - t_start
+        elif feature == "voicing_ratio":
+            xs, ys = pitch
+            lo = np.searchsorted(xs, t_start, side="left")
+            hi = np.searchsorted(xs, t_end, side="right")
+            frames = ys[lo:hi]
+            out[j] = np.count_nonzero(frames > 0) / frames.size if frames.size else math.nan
+        elif feature == "intensity":
+            xs, db = intensity
+            lo = np.searchsorted(xs, t_start, side="left")
+            hi = np.searchsorted(xs, t_end, side="right")
+            frames = db[lo:hi]
+            if frames.size:
+                # Average in the energy domain, as Praat's "Get mean... energy"
+                out[j] = 10 * np.log10(np.mean(10 ** (frames / 10)))
+                out[j + 1] = np.max(frames)
+            else:
+                out[j] = out[j + 1] = math.nan
+        j += len(FEATURE_COLUMNS[feature])
+
+
+def get_interval_pitch_stats(pitch,
+                             t_start: float,
+                             t_end: float):
+    """
+    Compute F0 statistics for a given syllable interval in a robust way.
+
+    `pitch` is either a parselmouth.Pitch or an (xs, ys) pair as returned
+    by load_pitch_track.
+
+    - f0_mean: median F0 across the entire voiced portion of the interval
+               (after trimming extreme values).
+    - f0_min / f0_max: min / max of the voiced frames in the interval.
+    - f0_start: median F0 over the FIRST third of the interval.
+    - f0_end:   median F0 over the LAST third of the interval.
+
+    This is more stable than taking a single F0 value exactly at the
+    boundary times, and should better reflect rising vs. falling contours.
+    """
+    if isinstance(pitch, tuple):
+        xs, ys = pitch
+    else:
+        xs = pitch.xs()  # time stamps of pitch frames
+        ys = pitch.selected_array["frequency"]  # F0 values (Hz)
+
+    out = np.empty(len(STAT_COLUMNS))
+    _pitch_stats_into(xs, ys, t_start, t_end, out)
+    return {col: float(v) for col, v in zip(STAT_COLUMNS, out)}
+
+
+class TokenTable:
+    """
+    Preallocated columnar storage for extracted tokens.
+
+    Times and F0 statistics are float32 columns, speaker and syllable are
+    integer codes into small category lists, so a token costs 36 bytes
+    (plus 4 per extra feature column) instead of a Python dict with boxed
+    floats and strings. to_frame() turns the filled rows into a DataFrame
+    with float32 and categorical columns without copying per-token objects.
+
+    `features` selects the extra measures (see FEATURES) that
+    process_one_pair fills in. Word / meaning annotations (word_id, word,
+    position, meaning; 14 more bytes per token) are allocated on the first
+    set_annotations() call, so tables without them keep the old columns.
+    """
+
+    VALUE_COLUMNS = ["t_start", "t_end"] + STAT_COLUMNS
+
+    def __init__(self, capacity: int, features=None):
+        self.features = list(FEATURES if features is None else features)
+        self.feature_columns = [c for f in self.features for c in FEATURE_COLUMNS[f]]
+        self.columns = self.VALUE_COLUMNS + self.feature_columns
+        self.values = np.full((len(self.columns), capacity), np.nan, dtype=np.float32)
+        self.speaker_codes = np.zeros(capacity, dtype=np.int32)
+        self.syllable_codes = np.zeros(capacity, dtype=np.int32)
+        self.speakers = {}   # speaker id -> code
+        self.syllables = {}  # syllable label -> code
+        self.annotations = None  # column name -> array, see set_annotations
+        self.words = {}      # word label -> code
+        self.meanings = {}   # meaning label -> code
+        self.size = 0
+
+    def add(self, speaker: str, syllable: str, t_start: float, t_end: float) -> int:
+        """Append one token (times only) and return its row index."""
+        i = self.size
+        if i >= self.values.shape[1]:
+            raise IndexError(f"TokenTable is full ({i} tokens).")
+        self.speaker_codes[i] = self.speakers.setdefault(speaker, len(self.speakers))
+        self.syllable_codes[i] = self.syllables.setdefault(syllable, len(self.syllables))
+        self.values[0, i] = t_start
+        self.values[1, i] = t_end
+        self.size += 1
+        return i
+
+    def stats_view(self, i: int):
+        """Writable view of the F0 statistics of token i."""
+        return self.values[2:len(self.VALUE_COLUMNS), i]
+
+    def features_view(self, i: int):
+        """Writable view of the extra feature columns of token i."""
+        return self.values[len(self.VALUE_COLUMNS):, i]
+
+    def set_annotations(self, start: int, annotations: dict):
+        """
+        Store the word / meaning annotations (see annotate_syllables) of
+        the rows start, start + 1, ...
+        """
+        if self.annotations is None:
+            capacity = self.values.shape[1]
+            self.annotations = {
+                "word_id": np.full(capacity, -1, dtype=np.int32),
+                "word": np.full(capacity, -1, dtype=np.int32),
+                "position": np.zeros(capacity, dtype=np.int16),
+                "meaning": np.full(capacity, -1, dtype=np.int32),
+            }
+        rows = slice(start, start + len(annotations["word_id"]))
+        self.annotations["word_id"][rows] = annotations["word_id"]
+        self.annotations["position"][rows] = annotations["position"]
+        for col, codes in [("word", self.words), ("meaning", self.meanings)]:
+            self.annotations[col][rows] = [
+                -1 if label is None else codes.setdefault(label, len(codes))
+                for label in annotations[col]]
+
+    def to_frame(self) -> pd.DataFrame:
+        n = self.size
+        data = {
+            "speaker": pd.Categorical.from_codes(
+                self.speaker_codes[:n], categories=list(self.speakers)),
+            "syllable": pd.Categorical.from_codes(
+                self.syllable_codes[:n], categories=list(self.syllables)),
+        }
+        for j, col in enumerate(self.columns):
+            data[col] = self.values[j, :n]
+        if self.annotations is not None:
+            a = self.annotations
+            word_id = a["word_id"][:n]
+            data["word_id"] = pd.array(np.where(word_id >= 0, word_id, None), dtype="Int32")
+            data["word"] = pd.Categorical.from_codes(a["word"][:n], categories=list(self.words))
+            data["position"] = pd.array(np.where(word_id >= 0, a["position"][:n], None),
+                                        dtype="Int16")
+            data["meaning"] = pd.Categorical.from_codes(a["meaning"][:n],
+                                                        categories=list(self.meanings))
+        return pd.DataFrame(data, copy=False)
+
+
+def _tier_intervals(tier):
+    """[(label, t_start, t_end), ...] for the labeled intervals of a tier."""
+    intervals = []
+    for interval in tier.intervals:
+        label = interval.mark.strip()
+        if not label:
+            continue  # skip empty labels
+        intervals.append((label, float(interval.minTime), float(interval.maxTime)))
+    return intervals
+
+
+def read_intervals(textgrid_path: str, tier_name: str = TIER_NAME):
+    """Return [(label, t_start, t_end), ...] for the labeled intervals of a tier."""
+    from textgrid import TextGrid
+
+    return _tier_intervals(get_tier(TextGrid.fromFile(textgrid_path), tier_name))
+
+
+def align_intervals(starts, ends, outer_starts, outer_ends) -> np.ndarray:
+    """
+    Index of the outer interval that contains the midpoint of each inner
+    interval, or -1 if none does.
+
+    The outer intervals come from one interval tier, so they are sorted and
+    do not overlap: one binary search per inner interval finds the only
+    candidate (O((n + m) log m) instead of comparing every pair).
+    """
+    mid = 0.5 * (np.asarray(starts, dtype=np.float64) + np.asarray(ends, dtype=np.float64))
+    outer_starts = np.asarray(outer_starts, dtype=np.float64)
+    outer_ends = np.asarray(outer_ends, dtype=np.float64)
+    if outer_starts.size == 0:
+        return np.full(mid.shape, -1, dtype=np.int64)
+
+    k = np.searchsorted(outer_starts, mid, side="right") - 1
+    inside = (k >= 0) & (mid < outer_ends[np.maximum(k, 0)])
+    return np.where(inside, k, -1)
+
+
+def annotate_syllables(intervals, words=None, meanings=None) -> dict:
+    """
+    Join syllable intervals to the word and meaning intervals enclosing them.
+
+    Returns arrays / lists aligned with `intervals`:
+        word_id   index of the word interval in its tier (-1 = none)
+        word      word label (None = none)
+        position  1-based position of the syllable in its word (0 = none)
+        meaning   meaning label (None = none)
+    """
+    starts = [t0 for _, t0, _ in intervals]
+    ends = [t1 for _, _, t1 in intervals]
+
+    words = words or []
+    word_id = align_intervals(starts, ends, [w[1] for w in words], [w[2] for w in words])
+    position = np.zeros(len(intervals), dtype=np.int16)
+    inside = np.flatnonzero(word_id >= 0)
+    if inside.size:
+        # Syllables are in time order, so each word's syllables are contiguous
+        _, first, group = np.unique(word_id[inside], return_index=True, return_inverse=True)
+        position[inside] = np.arange(inside.size) - first[group] + 1
+
+    meanings = meanings or []
+    meaning_id = align_intervals(starts, ends, [m[1] for m in meanings], [m[2] for m in meanings])
+    return {
+        "word_id": word_id.astype(np.int32),
+        "word": [words[k][0] if k >= 0 else None for k in word_id],
+        "position": position,
+        "meaning": [meanings[k][0] if k >= 0 else None for k in meaning_id],
+    }
+
+
+def read_textgrid(textgrid_path: str, tier_name: str = TIER_NAME,
+                  word_tier: str = WORD_TIER, meaning_tier: str = MEANING_TIER):
+    """
+    Read the syllable tier and, if present, the word and meaning tiers of
+    one TextGrid (parsed once).
+
+    Returns (intervals, annotations): the syllable intervals as in
+    read_intervals, and annotate_syllables() of them, or None if the
+    TextGrid has neither a word nor a meaning tier.
+    """
+    from textgrid import TextGrid
+
+    textgrid = TextGrid.fromFile(textgrid_path)
+    intervals = _tier_intervals(get_tier(textgrid, tier_name))
+
+    names = {tier.name for tier in textgrid.tiers}
+    words = (_tier_intervals(get_tier(textgrid, word_tier))
+             if word_tier in names else None)
+    meanings = (_tier_intervals(get_tier(textgrid, meaning_tier))
+                if meaning_tier in names else None)
+    if words is None and meanings is None:
+        return intervals, None
+    return intervals, annotate_syllables(intervals, words, meanings)
+
+
+def process_one_pair(audio_path: str, textgrid_path: str,
+                     pitch_floor: float = PITCH_FLOOR,
+                     pitch_ceiling: float = PITCH_CEILING,
+                     sound: "parselmouth.Sound" = None,
+                     table: TokenTable = None,
+                     intervals=None, annotations=None) -> TokenTable:
+    """
+    Process one WAV + TextGrid pair and fill one TokenTable row per labeled
+    interval in the tier. Rows are appended to `table` if given (it must
+    have room for them), otherwise a table sized for this pair is created.
+    Word / meaning annotations (see read_textgrid) are stored with them.
+
+    The F0 statistics and the table's extra features are computed in the
+    same loop over the intervals. The audio is read at most once, and only
+    if a track is not cached.
+    """
+    print(f"\nProcessing: {os.path.basename(audio_path)}")
+
+    basename = os.path.splitext(os.path.basename(audio_path))[0]
+    speaker_id = basename  # can be treated as participant ID
+
+    if intervals is None:
+        intervals, annotations = read_textgrid(textgrid_path)
+    if table is None:
+        table = TokenTable(len(intervals))
+
+    loaded = [sound]
+
+    def get_sound():
+        if loaded[0] is None:
+            import parselmouth
+            loaded[0] = parselmouth.Sound(audio_path)
+        return loaded[0]
+
+    # Tracks for the entire sound (cached per setting)
+    xs, ys = load_pitch_track(audio_path, pitch_floor, pitch_ceiling, sound=get_sound)
+    intensity = (load_intensity_track(audio_path, sound=get_sound)
+                 if "intensity" in table.features else None)
+
+    if annotations is not None:
+        table.set_annotations(table.size, annotations)
+
+    for label, t_start, t_end in intervals:
+        i = table.add(speaker_id, label, t_start, t_end)
+        _pitch_stats_into(xs, ys, t_start, t_end, table.stats_view(i))
+        if table.features:
+            _features_into(table.features, t_start, t_end, (xs, ys), intensity,
+                           table.features_view(i))
+
+    return table
+
+
+def compute_T_values(df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
+    """
+    Convert f0_mean / f0_start / f0_end into T-values using
+    the Shí Fēng normalization method:
+
+        T = 5 * (log10(x) - log10(b)) / (log10(a) - log10(b))
+
+    where:
+        a = global maximum F0 across all tokens (upper register)
+        b = global minimum F0 across all tokens (lower register)
+        x = F0 at a given measurement point (mean / start / end)
+    """
+    all_f0 = df["f0_mean"].replace(0, np.nan).dropna()
+    if all_f0.empty:
+        print("⚠ No valid f0_mean values found. Cannot compute T-values.")
+        return df
+
+    a = all_f0.max()
+    b = all_f0.min()
+
+    if verbose:
+        print(f"\nUpper pitch register (a) = {a:.2f} Hz")
+        print(f"Lower pitch register (b) = {b:.2f} Hz")
+
+    log_b = math.log10(b)
+    log_range = math.log10(a) - log_b
+    return apply_T_values(df, log_b, log_range)
+
+
+def apply_T_values(df: pd.DataFrame, log_b, log_range) -> pd.DataFrame:
+    """
+    Add T_mean / T_start / T_end to df in place, given log10 of the lower
+    register and the log10 register range (scalars, or one value per row).
+    """
+    for col in ["f0_mean", "f0_start", "f0_end"]:
+        T_col = "T_" + col.split("_")[1]  # mean -> T_mean, start -> T_start, etc.
+        x = df[col].to_numpy(dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            T = np.where(x > 0, 5 * (np.log10(x) - log_b) / log_range, math.nan)
+        df[T_col] = T.astype(df[col].dtype)  # float32 columns stay float32
+
+    return df
+
+
+def speaker_pitch_settings(speakers, ranges_csv: str = OUTPUT_RANGES_CSV) -> dict:
+    """(pitch floor, pitch ceiling) used for each speaker at extraction time."""
+    settings = {s: (PITCH_FLOOR, PITCH_CEILING) for s in speakers}
+    if os.path.exists(ranges_csv):
+        ranges = pd.read_csv(ranges_csv)
+        for row in ranges.itertuples(index=False):
+            if row.speaker in settings:
+                settings[row.speaker] = (row.pitch_floor, row.pitch_ceiling)
+    return settings
+
+
+def find_pairs(textgrid_dir: str = TEXTGRID_DIR, audio_dir: str = AUDIO_DIR):
+    """Return [(audio_path, textgrid_path), ...] for every TextGrid with a WAV file."""
+    pairs = []
+    for tg_path in sorted(glob.glob(os.path.join(textgrid_dir, "*.TextGrid"))):
+        base = os.path.splitext(os.path.basename(tg_path))[0]
+        audio_path = os.path.join(audio_dir, base + ".wav")
+
+        if not os.path.exists(audio_path):
+            print(f"⚠ Corresponding audio file not found: {audio_path}")
+            continue
+        pairs.append((audio_path, tg_path))
+    return pairs
+
+
+def extract_f0(pairs=None):
+    """
+    Run both extraction passes over every (audio, TextGrid) pair.
+
+    Returns (df, ranges): one row per labeled interval with F0 statistics
+    and T-values, and one row per speaker with the pitch range used.
+    Returns (None, None) if nothing could be extracted.
+    """
+    import parselmouth
+
+    if pairs is None:
+        if not glob.glob(os.path.join(TEXTGRID_DIR, "*.TextGrid")):
+            print(f"No TextGrid files found in: {TEXTGRID_DIR}")
+            return None, None
+        pairs = find_pairs()
+
+    # Read every TextGrid first so the token table is allocated once
+    textgrids = [read_textgrid(tg_path) for _, tg_path in pairs]
+    intervals = [iv for iv, _ in textgrids]
+    table = TokenTable(sum(len(iv) for iv in intervals))
+    ranges = []
+
+    for (audio_path, tg_path), (pair_intervals, annotations) in zip(pairs, textgrids):
+        speaker_id = os.path.splitext(os.path.basename(audio_path))[0]
+        sound = parselmouth.Sound(audio_path)
+
+        # Pass 1: per-speaker pitch range from a coarse pitch track
+        if ADAPTIVE_PITCH_RANGE:
+            pitch_range = estimate_pitch_range(sound)
+        else:
+            pitch_range = {"pitch_floor": PITCH_FLOOR, "pitch_ceiling": PITCH_CEILING}
+        ranges.append({"speaker": speaker_id, "audio": audio_path, **pitch_range})
+
+        # Pass 2: fine pitch track with the speaker's own range
+        process_one_pair(
+            audio_path, tg_path,
+            pitch_range["pitch_floor"], pitch_range["pitch_ceiling"],
+            sound=sound, table=table, intervals=pair_intervals,
+            annotations=annotations,
+        )
+
+    if table.size == 0:
+        print("No intervals found across any TextGrid. Nothing to export.")
+        return None, None
+
+    ranges = pd.DataFrame(ranges)
+
+    if WRITE_FRAME_STORE:
+        from pitch_frame_store import build_frame_store
+
+        tokens = pd.DataFrame(
+            [(os.path.splitext(os.path.basename(audio_path))[0], label, t0, t1)
+             for (audio_path, _), pair_intervals in zip(pairs, intervals)
+             for label, t0, t1 in pair_intervals],
+            columns=["speaker", "syllable", "t_start", "t_end"],
+        )
+        build_frame_store(ranges, tokens)
+
+    ranges = ranges.drop(columns="audio")
+    print("\nPitch range per speaker (Hz):")
+    print(ranges.round(1).to_string(index=False))
+
+    df = table.to_frame()
+
+    # Compute T-values
+    df = compute_T_values(df)
+    return df, ranges
+
+
+def save_outputs(df: pd.DataFrame, ranges: pd.DataFrame):
+    os.makedirs(os.path.dirname(OUTPUT_F0_CSV), exist_ok=True)
+    ranges.to_csv(OUTPUT_RANGES_CSV, index=False, encoding="utf-8-sig")
+    df.to_csv(OUTPUT_F0_CSV, index=False, encoding="utf-8-sig")
+
+    print(f"\n✅ Done! F0 and T-values exported to:\n{OUTPUT_F0_CSV}")
+    print(f"Total intervals processed: {len(df)}")
+
+
+def main():
+    df, ranges = extract_f0()
+    if df is not None:
+        save_outputs(df, ranges)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:02:11 2026
+
+@author: xuechandai
+"""
+
+"""
+Data-driven tone category induction.
+
+Instead of the fixed level_thresh / max_step rules in label_tones_5degree.py,
+cluster every token's contour (T_start, T_mean, T_end) with k-means or a
+diagonal Gaussian mixture, then compare the clusters with the rule-based
+5-degree labels.
+
+All restarts are fitted together as one batch (arrays of shape
+restarts x clusters x features), and groups of restarts can be spread
+over worker processes. Tokens are processed in chunks so memory stays
+bounded on large corpora. Restarts are fitted on a subsample and only
+the best one is carried over to all tokens, so 1M tokens take a few
+seconds.
+
+Outputs (data/processed/):
+    tone_clusters.csv             one row per token with its cluster
+    tone_cluster_assignments.csv  cluster centers + assigned 5-degree label
+    tone_cluster_confusion.csv    cluster x rule-based label counts
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from label_tones_5degree import TONE_CODE_LABELS, classify_tone_codes
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "f0_with_T_values_labeled.csv")
+OUTPUT_TOKENS_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "tone_clusters.csv")
+OUTPUT_ASSIGN_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "tone_cluster_assignments.csv")
+OUTPUT_CONFUSION_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "tone_cluster_confusion.csv")
+
+FEATURES = ["T_start", "T_mean", "T_end"]
+
+# Clustering parameters
+METHOD = "kmeans"        # "kmeans" or "gmm"
+N_CLUSTERS = 6
+N_RESTARTS = 8
+MAX_ITER = 100
+TOL = 1e-4               # stop when the mean shift of the centers is below this
+N_JOBS = 1               # >1 spreads groups of restarts over worker processes
+FIT_SAMPLE = 20000       # restarts are fitted on a random subsample of this size
+REFINE_ITER = 10         # full-data k-means iterations for the best restart
+CHUNK_SIZE = 1 << 17     # tokens per distance block
+RANDOM_SEED = 0
+
+# ======================================================
+
+
+def _chunks(n, size=CHUNK_SIZE):
+    for lo in range(0, n, size):
+        yield lo, min(lo + size, n)
+
+
+def _init_centers(X, k, rng):
+    """k-means++ seeding on a random subsample of at most 10k tokens."""
+    sample = X[rng.choice(len(X), size=min(len(X), 10000), replace=False)]
+    centers = [sample[rng.integers(len(sample))]]
+    d2 = ((sample - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        p = d2 / d2.sum() if d2.sum() > 0 else None
+        centers.append(sample[rng.choice(len(sample), p=p)])
+        d2 = np.minimum(d2, ((sample - centers[-1]) ** 2).sum(axis=1))
+    return np.stack(centers)
+
+
+def _assign(X, centers):
+    """
+    Nearest center for every token under every restart.
+
+    X: (n, d), centers: (R, k, d) -> labels (R, n), squared distance (R, n)
+    """
+    R, k, d = centers.shape
+    labels = np.zeros((R, len(X)), dtype=np.int32)
+    best = np.full((R, len(X)), np.inf, dtype=X.dtype)
+    for lo, hi in _chunks(len(X)):
+        dist = np.zeros((R, hi - lo), dtype=X.dtype)
+        diff = np.empty_like(dist)
+        for j in range(k):
+            dist[:] = 0.0
+            for e in range(d):
+                np.subtract(X[None, lo:hi, e], centers[:, j, e, None], out=diff)
+                dist += diff * diff
+            closer = dist < best[:, lo:hi]
+            np.copyto(best[:, lo:hi], dist, where=closer)
+            np.copyto(labels[:, lo:hi], j, where=closer)
+    return labels, best
+
+
+def _cluster_sums(X, labels, k):
+    """Per (restart, cluster) token counts and feature sums via bincount."""
+    R = labels.shape[0]
+    flat = (labels + (np.arange(R) * k)[:, None]).ravel()
+    counts = np.bincount(flat, minlength=R * k).reshape(R, k)
+    sums = np.stack(
+        [
+            np.bincount(flat, weights=np.tile(X[:, j], R), minlength=R * k).reshape(R, k)
+            for j in range(X.shape[1])
+        ],
+        axis=2,
+    )
+    return counts, sums
+
+
+def fit_kmeans_batch(X, k, seeds=None, centers=None, max_iter=MAX_ITER, tol=TOL):
+    """
+    Fit one k-means run per seed (or per given initial center set, shape
+    (R, k, d)), all restarts updated together.
+
+    Returns (centers (R, k, d), inertia (R,)).
+    """
+    if centers is None:
+        centers = np.stack([_init_centers(X, k, np.random.default_rng(s)) for s in seeds])
+    centers = centers.astype(X.dtype)
+    for _ in range(max_iter):
+        labels, _ = _assign(X, centers)
+        counts, sums = _cluster_sums(X, labels, k)
+        # Empty clusters keep their previous center
+        new = np.where(counts[:, :, None] > 0, sums / np.maximum(counts, 1)[:, :, None], centers)
+        new = new.astype(X.dtype)
+        shift = np.abs(new - centers).mean()
+        centers = new
+        if shift < tol:
+            break
+    _, dist = _assign(X, centers)
+    return centers, dist.sum(axis=1, dtype=np.float64)
+
+
+def _gmm_log_resp(X, means, variances, weights):
+    """Per restart log-likelihood and responsibilities for one token block."""
+    # log N(x | mu, diag(var)) for all (restart, token, component)
+    log_det = np.log(variances).sum(axis=2)[:, None, :]
+    prec = 1.0 / variances
+    maha = (
+        (X * X) @ prec.transpose(0, 2, 1)
+        - 2.0 * X @ (means * prec).transpose(0, 2, 1)
+        + (means * means * prec).sum(axis=2)[:, None, :]
+    )
+    log_p = np.log(weights)[:, None, :] - 0.5 * (maha + log_det + X.shape[1] * np.log(2 * np.pi))
+    log_max = log_p.max(axis=2, keepdims=True)
+    p = np.exp(log_p - log_max)
+    p_sum = p.sum(axis=2, keepdims=True)
+    return (log_max + np.log(p_sum))[:, :, 0], p / p_sum
+
+
+def fit_gmm_batch(X, k, seeds=None, params=None, max_iter=MAX_ITER, tol=TOL):
+    """
+    Fit one diagonal-covariance Gaussian mixture per seed by EM, all
+    restarts updated together. Each mixture is initialized from a short
+    k-means run with the same seed, unless initial (means, variances,
+    weights) are given in params.
+
+    Returns (means (R, k, d), variances (R, k, d), weights (R, k),
+             negative log-likelihood (R,)).
+    """
+    if params is None:
+        means, _ = fit_kmeans_batch(X, k, seeds, max_iter=10, tol=tol)
+        R, _, d = means.shape
+        variances = np.broadcast_to(X.var(axis=0) + 1e-3, (R, k, d)).copy()
+        weights = np.full((R, k), 1.0 / k)
+    else:
+        means, variances, weights = params
+        R, _, d = means.shape
+
+    prev = np.full(R, -np.inf)
+    for _ in range(max_iter):
+        resp_sum = np.zeros((R, k))
+        x_sum = np.zeros((R, k, d))
+        x2_sum = np.zeros((R, k, d))
+        loglik = np.zeros(R)
+        for lo, hi in _chunks(len(X), CHUNK_SIZE // max(k, 1)):
+            x = X[lo:hi]
+            log_norm, resp = _gmm_log_resp(x, means, variances, weights)
+            loglik += log_norm.sum(axis=1)
+            resp_sum += resp.sum(axis=1)
+            x_sum += resp.transpose(0, 2, 1) @ x
+            x2_sum += resp.transpose(0, 2, 1) @ (x * x)
+
+        nk = np.maximum(resp_sum, 1e-10)[:, :, None]
+        means = x_sum / nk
+        variances = np.maximum(x2_sum / nk - means ** 2, 1e-3)
+        weights = np.maximum(resp_sum / len(X), 1e-10)
+
+        if np.all(np.abs(loglik - prev) < tol * len(X)):
+            break
+        prev = loglik
+    return means, variances, weights, -loglik
+
+
+def _fit_group(args):
+    X, k, seeds, method = args
+    if method == "gmm":
+        return fit_gmm_batch(X, k, seeds)
+    return fit_kmeans_batch(X, k, seeds)
+
+
+def fit_clusters(X, k=N_CLUSTERS, n_restarts=N_RESTARTS, method=METHOD,
+                 n_jobs=N_JOBS, seed=RANDOM_SEED):
+    """
+    Fit all restarts on a subsample (in n_jobs groups), refine the best
+    k-means restart on the full data and return the token labels together
+    with the cluster centers.
+    """
+    rng = np.random.default_rng(seed)
+    sample = X if len(X) <= FIT_SAMPLE else X[rng.choice(len(X), FIT_SAMPLE, replace=False)]
+
+    seeds = np.random.SeedSequence(seed).generate_state(n_restarts)
+    groups = [g for g in np.array_split(seeds, max(1, min(n_jobs, n_restarts))) if len(g)]
+    tasks = [(sample, k, g, method) for g in groups]
+
+    if len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=len(tasks)) as pool:
+            results = list(pool.map(_fit_group, tasks))
+    else:
+        results = [_fit_group(tasks[0])]
+
+    # Concatenate restart axes and keep the restart with the lowest cost
+    fitted = [np.concatenate(parts) for parts in zip(*results)]
+    best = int(np.argmin(fitted[-1]))
+    params = [p[best:best + 1] for p in fitted[:-1]]
+
+    if method == "gmm":
+        # Mixture parameters are stable on the subsample; full-data EM
+        # would cost far more than the final assignment below
+        means, variances, weights = params
+        labels = np.empty(len(X), dtype=np.int32)
+        for lo, hi in _chunks(len(X)):
+            _, resp = _gmm_log_resp(X[lo:hi], means, variances, weights)
+            labels[lo:hi] = resp[0].argmax(axis=1)
+        return labels, means[0]
+
+    centers = params[0]
+    if sample is not X:
+        centers, _ = fit_kmeans_batch(X, k, centers=centers, max_iter=REFINE_ITER)
+    labels, _ = _assign(X, centers)
+    return labels[0], centers[0]
+
+
+def confusion_table(clusters, rule_codes, k):
+    """Cluster x rule-label count matrix (rows: clusters, cols: tone codes)."""
+    n_codes = len(TONE_CODE_LABELS)
+    counts = np.bincount(clusters * n_codes + rule_codes, minlength=k * n_codes)
+    counts = counts.reshape(k, n_codes)[:, 1:]  # drop the "no label" code
+    used = counts.sum(axis=0) > 0
+    return pd.DataFrame(
+        counts[:, used],
+        index=pd.Index(np.arange(k), name="cluster"),
+        columns=TONE_CODE_LABELS[1:][used],
+    )
+
+
+def induce_tone_clusters(df: pd.DataFrame, k=N_CLUSTERS, n_restarts=N_RESTARTS,
+                         method=METHOD, n_jobs=N_JOBS, seed=RANDOM_SEED):
+    """
+    Cluster the T-value contours in df.
+
+    Returns (tokens, assignments, confusion):
+        tokens:      df rows with complete features + rule_tone / cluster /
+                     cluster_tone columns
+        assignments: one row per cluster with its center, size, the
+                     majority rule-based label and its purity
+        confusion:   cluster x rule-based label counts
+    """
+    X = np.clip(df[FEATURES].to_numpy(dtype=np.float32), 0.0, 5.0)
+    ok = ~np.isnan(X).any(axis=1)
+    X = X[ok]
+    tokens = df.loc[ok].copy()
+    if len(X) < k:
+        raise ValueError(f"Need at least {k} tokens with complete {FEATURES}, got {len(X)}.")
+
+    rule_codes = classify_tone_codes(
+        tokens["T_start"].to_numpy(), tokens["T_end"].to_numpy(), tokens["T_mean"].to_numpy()
+    )
+
+    labels, centers = fit_clusters(X, k, n_restarts, method, n_jobs, seed)
+    confusion = confusion_table(labels, rule_codes, k)
+
+    sizes = confusion.sum(axis=1).to_numpy()
+    majority = confusion.to_numpy().argmax(axis=1)
+    assignments = pd.DataFrame(centers, columns=FEATURES)
+    assignments.insert(0, "cluster", np.arange(k))
+    assignments["n_tokens"] = np.bincount(labels, minlength=k)
+    assignments["assigned_tone"] = np.where(sizes > 0, confusion.columns.to_numpy()[majority], np.nan)
+    assignments["purity"] = np.where(
+        sizes > 0, confusion.to_numpy().max(axis=1) / np.maximum(sizes, 1), np.nan
+    )
+
+    tokens["rule_tone"] = TONE_CODE_LABELS[rule_codes]
+    tokens["cluster"] = labels
+    tokens["cluster_tone"] = assignments["assigned_tone"].to_numpy()[labels]
+    return tokens, assignments, confusion
+
+
+def main():
+    df = pd.read_csv(INPUT_CSV)
+
+    t0 = time.perf_counter()
+    tokens, assignments, confusion = induce_tone_clusters(df)
+    elapsed = time.perf_counter() - t0
+
+    agree = (tokens["cluster_tone"].astype(str) == tokens["rule_tone"].astype(str)).mean()
+
+    print(f"\n=== Tone clusters ({METHOD}, k={N_CLUSTERS}, {N_RESTARTS} restarts) ===")
+    print(assignments.round(3))
+    print("\n=== Cluster x rule-based label ===")
+    print(confusion)
+    print(f"\nAgreement with rule-based labels: {agree:.1%}")
+    print(f"Clustered {len(tokens)} tokens in {elapsed:.2f} s")
+
+    tokens.to_csv(OUTPUT_TOKENS_CSV, index=False, encoding="utf-8-sig")
+    assignments.to_csv(OUTPUT_ASSIGN_CSV, index=False, encoding="utf-8-sig")
+    confusion.to_csv(OUTPUT_CONFUSION_CSV, encoding="utf-8-sig")
+    print(f"\nSaved to:\n  {OUTPUT_TOKENS_CSV}\n  {OUTPUT_ASSIGN_CSV}\n  {OUTPUT_CONFUSION_CSV}")
+
+
+if __name__ == "__main__":
+    main()
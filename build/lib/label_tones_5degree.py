@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Dec  8 11:16:47 2025
+
+@author: xuechandai
+"""
+
+import os
+import pandas as pd
+import numpy as np
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "f0_with_T_values.csv")
+OUTPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "f0_with_T_values_labeled.csv")
+
+
+def clamp_T(T):
+    if pd.isna(T):
+        return np.nan
+    return min(5.0, max(0.0, T))
+
+def t_to_height(T):
+    if pd.isna(T):
+        return np.nan
+    h = int(round(T))
+    if h < 1: h = 1
+    if h > 5: h = 5
+    return h
+
+def classify_tone(Ts, Te, Tm, level_thresh=1.0, max_step=2):
+
+    Ts = clamp_T(Ts)
+    Te = clamp_T(Te)
+    Tm = clamp_T(Tm)
+
+    if pd.isna(Ts) and pd.isna(Te) and pd.isna(Tm):
+        return np.nan
+
+    if pd.isna(Ts) or pd.isna(Te):
+        if pd.isna(Tm):
+            return np.nan
+        h = t_to_height(Tm)
+        return f"{h}{h}"
+
+    delta = Te - Ts
+
+
+    if abs(delta) < level_thresh:
+        h_avg = t_to_height((Ts + Te) / 2.0)
+        return f"{h_avg}{h_avg}"
+
+    h_start = t_to_height(Ts)
+    h_end = t_to_height(Te)
+
+
+    if h_end - h_start > max_step:
+        h_end = h_start + max_step
+    if h_start - h_end > max_step:
+        h_start = h_end + max_step
+
+    return f"{h_start}{h_end}"
+
+
+# Lookup table from integer tone codes (e.g. 24) to labels (e.g. "24").
+# Code 0 means "no label" and maps to NaN.
+TONE_CODE_LABELS = np.array(
+    [np.nan if code == 0 else str(code) for code in range(56)], dtype=object
+)
+
+
+def _heights(T):
+    """Vectorized t_to_height for already clamped T arrays (NaN -> 0)."""
+    h = np.clip(np.rint(T), 1, 5)
+    return np.where(np.isnan(h), 0, h).astype(np.int16)
+
+
+def classify_tone_codes(Ts, Te, Tm, level_thresh=1.0, max_step=2):
+    """
+    Vectorized version of classify_tone.
+
+    Takes arrays of T_start / T_end / T_mean and returns an int16 array of
+    tone codes (start height * 10 + end height, e.g. 24), with 0 where
+    classify_tone would return NaN. Gives exactly the same labels as
+    calling classify_tone row by row.
+    """
+    Ts = np.clip(np.asarray(Ts, dtype=np.float64), 0.0, 5.0)
+    Te = np.clip(np.asarray(Te, dtype=np.float64), 0.0, 5.0)
+    Tm = np.clip(np.asarray(Tm, dtype=np.float64), 0.0, 5.0)
+
+    # Level tones: either start/end is missing (fall back to T_mean)
+    # or the start-end difference is below the threshold
+    edge_missing = np.isnan(Ts) | np.isnan(Te)
+    with np.errstate(invalid="ignore"):
+        level = ~edge_missing & (np.abs(Te - Ts) < level_thresh)
+    h_level = np.where(edge_missing, _heights(Tm), _heights((Ts + Te) / 2.0))
+
+    h_start = _heights(Ts)
+    h_end = _heights(Te)
+    h_end = np.where(h_end - h_start > max_step, h_start + max_step, h_end)
+    h_start = np.where(h_start - h_end > max_step, h_end + max_step, h_start)
+
+    codes = np.where(edge_missing | level, h_level * 11, h_start * 10 + h_end)
+    return codes.astype(np.int16)
+
+
+def classify_tone_batch(Ts, Te, Tm, level_thresh=1.0, max_step=2):
+    """Vectorized classify_tone returning string labels (NaN if unlabeled)."""
+    return TONE_CODE_LABELS[classify_tone_codes(Ts, Te, Tm, level_thresh, max_step)]
+
+
+def label_tones(df: pd.DataFrame, level_thresh=1.0, max_step=2) -> pd.DataFrame:
+    """Add a 5-degree tone label (tone_5deg) to every token with T-values."""
+    df = df.copy()
+    df["tone_5deg"] = classify_tone_batch(
+        df["T_start"], df["T_end"], df["T_mean"],
+        level_thresh=level_thresh, max_step=max_step,
+    )
+    return df
+
+
+def main():
+    df = label_tones(pd.read_csv(INPUT_CSV), level_thresh=1.0, max_step=2)
+
+    df.to_csv(OUTPUT_CSV, index=False, encoding="utf-8-sig")
+
+    print(f"Done! Labeled tones saved to: {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 23:02:44 2026
+
+@author: xuechandai
+"""
+
+"""
+Load test for sandhi_query_service.py.
+
+N_CLIENTS threads each keep one HTTP/1.1 connection open and send queries
+for DURATION seconds: single GET argmax queries, and POST batches of
+BATCH_SIZE mixed queries. Reports requests/s, answered queries/s and
+latency percentiles.
+
+If no service is listening on HOST:PORT, one is started in a subprocess
+for the duration of the test.
+
+    python src/load_test_query_service.py [n_clients] [duration_s]
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+import http.client
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from sandhi_query_service import HOST, PORT
+from derive_sandhi_with_manual_tones import CITATION_TONES
+
+
+N_CLIENTS = 8
+DURATION = 5.0
+BATCH_SIZE = 100
+
+# ======================================================
+
+
+def _health(host=HOST, port=PORT) -> bool:
+    try:
+        conn = http.client.HTTPConnection(host, port, timeout=1)
+        conn.request("GET", "/health")
+        ok = conn.getresponse().status == 200
+        conn.close()
+        return ok
+    except OSError:
+        return False
+
+
+def start_service(host=HOST, port=PORT, timeout=30.0):
+    """Start the service in a subprocess and wait until it answers /health."""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandhi_query_service.py")
+    proc = subprocess.Popen([sys.executable, script, str(port)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if _health(host, port):
+            return proc
+        time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError(f"Query service did not start on {host}:{port}")
+
+
+def _client(kind, duration, latencies, counts, seed):
+    rng = np.random.default_rng(seed)
+    chars = list(CITATION_TONES)
+    conn = http.client.HTTPConnection(HOST, PORT)
+    deadline = time.monotonic() + duration
+    n_requests = n_queries = 0
+
+    while time.monotonic() < deadline:
+        if kind == "single":
+            char = chars[rng.integers(len(chars))]
+            path = f"/predict?char={quote(char)}&position={rng.integers(1, 3)}&mode=argmax"
+            t0 = time.perf_counter()
+            conn.request("GET", path)
+            n = 1
+        else:
+            queries = [{"char": chars[i], "position": int(p), "mode": m, "n": 3}
+                       for i, p, m in zip(rng.integers(len(chars), size=BATCH_SIZE),
+                                          rng.integers(1, 3, size=BATCH_SIZE),
+                                          rng.choice(["distribution", "argmax", "sample"],
+                                                     size=BATCH_SIZE))]
+            body = json.dumps({"queries": queries}).encode("utf-8")
+            t0 = time.perf_counter()
+            conn.request("POST", "/predict", body, {"Content-Type": "application/json"})
+            n = BATCH_SIZE
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - t0)
+        n_requests += 1
+        n_queries += n
+
+    conn.close()
+    counts.append((n_requests, n_queries))
+
+
+def run_load_test(kind: str, n_clients=N_CLIENTS, duration=DURATION) -> dict:
+    latencies, counts = [], []
+    threads = [threading.Thread(target=_client, args=(kind, duration, latencies, counts, i))
+               for i in range(n_clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    n_requests = sum(c[0] for c in counts)
+    n_queries = sum(c[1] for c in counts)
+    ms = np.array(latencies) * 1000
+    return {
+        "test": kind,
+        "requests_per_s": n_requests / duration,
+        "queries_per_s": n_queries / duration,
+        "p50_ms": np.percentile(ms, 50),
+        "p95_ms": np.percentile(ms, 95),
+        "p99_ms": np.percentile(ms, 99),
+    }
+
+
+def main():
+    n_clients = int(sys.argv[1]) if len(sys.argv) > 1 else N_CLIENTS
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else DURATION
+
+    proc = None if _health() else start_service()
+    try:
+        results = pd.DataFrame([run_load_test("single", n_clients, duration),
+                                run_load_test("batch", n_clients, duration)])
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    print(f"\n=== Sandhi query service, {n_clients} keep-alive clients, {duration:g}s each ===")
+    print(results.round(2).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
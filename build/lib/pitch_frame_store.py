@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 11:03:58 2026
+
+@author: xuechandai
+"""
+
+"""
+Corpus-wide pitch frame store.
+
+All speakers' pitch frames are written back to back into two memory-mapped
+arrays, with a speaker index and a token index pointing into them:
+
+    frame_store/frame_times.npy   float64, one entry per pitch frame
+    frame_store/frame_f0.npy      float32, F0 in Hz (0 = unvoiced)
+    frame_store/speakers.csv      speaker, audio, pitch range, frame_start, frame_end
+    frame_store/tokens.csv        token, speaker, syllable, t_start, t_end,
+                                  frame_start, frame_end
+
+`token` is the row number in f0_with_T_values.csv. A token's frames are
+the slice [frame_start, frame_end) of both arrays, so FrameStore returns
+them in O(1) as views on the memory map, without reading any audio.
+Statistics such as those of get_interval_pitch_stats, or new measures
+(F0 at fixed points of the contour, ...), can be recomputed from them.
+
+extract_f0_from_textgrid.py writes the store at the end of extraction.
+Running this script rebuilds it from f0_with_T_values.csv and the pitch
+track cache.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import extract_f0_from_textgrid as extract
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+F0_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "f0_with_T_values.csv")
+FRAME_STORE_DIR = os.path.join(PROJECT_ROOT, "data", "processed", "frame_store")
+
+FRAME_DTYPE = np.float32
+CONTOUR_POINTS = 10
+
+# ======================================================
+
+
+def _store_paths(store_dir: str):
+    return {name: os.path.join(store_dir, name) for name in
+            ["frame_times.npy", "frame_f0.npy", "speakers.csv", "tokens.csv"]}
+
+
+def build_frame_store(speakers: pd.DataFrame, tokens: pd.DataFrame,
+                      store_dir: str = FRAME_STORE_DIR):
+    """
+    Write the frame store.
+
+    speakers: one row per speaker with speaker, audio, pitch_floor, pitch_ceiling
+    tokens:   one row per token with speaker, syllable, t_start, t_end, in
+              the row order of f0_with_T_values.csv
+
+    Pitch tracks come from the extraction cache (recomputed only if missing)
+    and are held in memory one speaker at a time.
+    """
+    from numpy.lib.format import open_memmap
+
+    os.makedirs(store_dir, exist_ok=True)
+    paths = _store_paths(store_dir)
+
+    def track(row):
+        return extract.load_pitch_track(row.audio, row.pitch_floor, row.pitch_ceiling)
+
+    speakers = speakers.reset_index(drop=True).copy()
+    lengths = np.array([len(track(row)[0]) for row in speakers.itertuples(index=False)],
+                       dtype=np.int64)
+    speakers["frame_end"] = np.cumsum(lengths)
+    speakers["frame_start"] = speakers["frame_end"] - lengths
+
+    n_frames = int(lengths.sum())
+    times = open_memmap(paths["frame_times.npy"], mode="w+", dtype=np.float64, shape=(n_frames,))
+    f0 = open_memmap(paths["frame_f0.npy"], mode="w+", dtype=FRAME_DTYPE, shape=(n_frames,))
+
+    tokens = tokens[["speaker", "syllable", "t_start", "t_end"]].copy()
+    tokens.insert(0, "token", np.arange(len(tokens)))
+    frame_start = np.zeros(len(tokens), dtype=np.int64)
+    frame_end = np.zeros(len(tokens), dtype=np.int64)
+    token_speaker = tokens["speaker"].astype(str).to_numpy()
+
+    for row in speakers.itertuples(index=False):
+        xs, ys = track(row)
+        times[row.frame_start:row.frame_end] = xs
+        f0[row.frame_start:row.frame_end] = np.nan_to_num(ys, nan=0.0)
+
+        # Same windows as _pitch_stats_into: [t_start, t_end] inclusive
+        mine = np.flatnonzero(token_speaker == str(row.speaker))
+        frame_start[mine] = row.frame_start + np.searchsorted(
+            xs, tokens["t_start"].to_numpy(np.float64)[mine], side="left")
+        frame_end[mine] = row.frame_start + np.searchsorted(
+            xs, tokens["t_end"].to_numpy(np.float64)[mine], side="right")
+
+    times.flush()
+    f0.flush()
+    del times, f0
+
+    tokens["frame_start"] = frame_start
+    tokens["frame_end"] = frame_end
+    speakers[["speaker", "audio", "pitch_floor", "pitch_ceiling", "frame_start", "frame_end"]].to_csv(
+        paths["speakers.csv"], index=False, encoding="utf-8-sig")
+    tokens.to_csv(paths["tokens.csv"], index=False, encoding="utf-8-sig")
+    print(f"✅ Frame store: {n_frames} frames, {len(tokens)} tokens -> {store_dir}")
+
+
+class FrameStore:
+    """Read-only view of a frame store; token frames are memory-map slices."""
+
+    def __init__(self, store_dir: str = FRAME_STORE_DIR):
+        paths = _store_paths(store_dir)
+        self.times = np.load(paths["frame_times.npy"], mmap_mode="r")
+        self.f0 = np.load(paths["frame_f0.npy"], mmap_mode="r")
+        self.speakers = pd.read_csv(paths["speakers.csv"])
+        self.tokens = pd.read_csv(paths["tokens.csv"])
+        self._bounds = self.tokens[["frame_start", "frame_end"]].to_numpy(np.int64)
+        self._intervals = self.tokens[["t_start", "t_end"]].to_numpy(np.float64)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def token_frames(self, i: int):
+        """(times, f0) of token i, as views on the memory map."""
+        lo, hi = self._bounds[i]
+        return self.times[lo:hi], self.f0[lo:hi]
+
+    def speaker_frames(self, speaker: str):
+        """(times, f0) of a speaker's whole recording."""
+        row = self.speakers.loc[self.speakers["speaker"] == speaker].iloc[0]
+        lo, hi = row["frame_start"], row["frame_end"]
+        return self.times[lo:hi], self.f0[lo:hi]
+
+    def measure(self, func, n_values: int) -> np.ndarray:
+        """
+        Apply func(times, f0, t_start, t_end, out) to every token, where out
+        is that token's row of a (n_tokens, n_values) float32 result array.
+        """
+        result = np.full((len(self), n_values), np.nan, dtype=np.float32)
+        for i in range(len(self)):
+            times, f0 = self.token_frames(i)
+            func(times, f0, self._intervals[i, 0], self._intervals[i, 1], result[i])
+        return result
+
+    def pitch_stats(self) -> pd.DataFrame:
+        """STAT_COLUMNS recomputed from the stored frames."""
+        values = self.measure(extract._pitch_stats_into, len(extract.STAT_COLUMNS))
+        return pd.DataFrame(values, columns=extract.STAT_COLUMNS)
+
+    def contour_points(self, n_points: int = CONTOUR_POINTS) -> pd.DataFrame:
+        """
+        F0 at n_points equally spaced times from t_start to t_end, linearly
+        interpolated between voiced frames (NaN if the token has none).
+        """
+        fractions = np.linspace(0.0, 1.0, n_points)
+
+        def points(times, f0, t_start, t_end, out):
+            voiced = f0 > 0
+            if voiced.any():
+                out[:] = np.interp(t_start + fractions * (t_end - t_start),
+                                   times[voiced], f0[voiced])
+
+        values = self.measure(points, n_points)
+        return pd.DataFrame(values, columns=[f"f0_p{k}" for k in range(n_points)])
+
+
+def build_from_csv(f0_csv: str = F0_CSV, audio_dir: str = extract.AUDIO_DIR,
+                   store_dir: str = FRAME_STORE_DIR):
+    """Rebuild the store for the tokens of f0_with_T_values.csv."""
+    tokens = pd.read_csv(f0_csv, usecols=["speaker", "syllable", "t_start", "t_end"])
+    names = list(dict.fromkeys(tokens["speaker"].astype(str)))
+    settings = extract.speaker_pitch_settings(names)
+
+    rows = []
+    for name in names:
+        audio_path = os.path.join(audio_dir, name + ".wav")
+        if not os.path.exists(audio_path):
+            print(f"⚠ No audio for {name}; its tokens get empty frame ranges.")
+            continue
+        rows.append({"speaker": name, "audio": audio_path,
+                     "pitch_floor": settings[name][0], "pitch_ceiling": settings[name][1]})
+    if not rows:
+        print("No audio found; frame store not written.")
+        return
+    build_frame_store(pd.DataFrame(rows), tokens, store_dir)
+
+
+def main():
+    build_from_csv()
+
+
+if __name__ == "__main__":
+    main()
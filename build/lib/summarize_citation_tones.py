@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Dec  8 22:11:16 2025
+
+@author: xuechandai
+"""
+
+import os
+import pandas as pd
+import numpy as np
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "f0_with_T_values_labeled.csv")
+OUTPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "citation_tone_summary.csv")
+
+
+# Citation-tone groups (single-syllable citation tones)
+TONE_GROUPS = {
+    "Tone1": ["妈", "花", "高", "多", "天"],
+    "Tone2": ["麻", "头", "牛", "人", "狼"],
+    "Tone3": ["马", "你", "我", "米", "水"],
+    "Tone4": ["骂", "饭", "菜", "豆", "二"],
+}
+
+def tone_change(tone_str: str) -> int:
+    """
+    Compute the contour magnitude of a 5-degree tone label.
+    Example:
+        "22" -> 0
+        "13" -> 2
+        "35" -> 2
+    If tone_str is invalid, return 0.
+    """
+    if pd.isna(tone_str):
+        return 0
+    s = str(tone_str)
+    if len(s) < 2 or not s[0].isdigit() or not s[1].isdigit():
+        return 0
+    return abs(int(s[0]) - int(s[1]))
+
+
+def summarize_citation_tones(df: pd.DataFrame, tone_groups=TONE_GROUPS,
+                             verbose: bool = True) -> pd.DataFrame:
+    """
+    Select one citation tone (5-degree label) per tone group from the
+    monosyllabic tokens in df (columns: syllable, tone_5deg).
+    """
+    df = df.copy()
+
+    # Ensure tone labels are treated as strings
+    df["tone_5deg"] = df["tone_5deg"].astype(str)
+
+    results = []
+
+    for tone_name, chars in tone_groups.items():
+
+        subset = df[df["syllable"].isin(chars)].copy()
+        subset = subset.dropna(subset=["tone_5deg"])
+
+        if subset.empty:
+            if verbose:
+                print(f"{tone_name}: no tokens found for {chars}")
+            continue
+
+        # Count tone label occurrences within this tone group
+        counts = subset["tone_5deg"].value_counts()
+
+        # Remove outliers: tone labels appearing only once
+        if (counts > 1).any():
+            kept_labels = counts[counts > 1].index
+            subset = subset[subset["tone_5deg"].isin(kept_labels)]
+            counts = subset["tone_5deg"].value_counts()
+
+        # If all labels were removed as outliers, fall back to the original counts
+        if counts.empty:
+            counts = df[df["syllable"].isin(chars)]["tone_5deg"].value_counts()
+
+        if counts.empty:
+            if verbose:
+                print(f"{tone_name}: still empty after fallback; skipping.")
+            continue
+
+        # Determine mode(s)
+        max_count = counts.max()
+        candidates = list(counts[counts == max_count].index)
+
+        # If multiple labels tie, choose the one with the largest contour magnitude
+        if len(candidates) == 1:
+            chosen = candidates[0]
+        else:
+            chosen = max(candidates, key=tone_change)
+
+        candidates_str = [str(c) for c in candidates]
+
+        results.append({
+            "tone_group": tone_name,
+            "characters": "".join(chars),
+            "selected_tone": str(chosen),
+            "candidate_tones": ",".join(candidates_str),
+        })
+
+        if verbose:
+            print(f"{tone_name}: selected {chosen}  (candidates: {candidates_str})")
+
+    return pd.DataFrame(results)
+
+
+def main():
+    # 1. Load the dataset with 5-degree tone labels
+    df = pd.read_csv(INPUT_CSV)
+
+    # 2. Select one citation tone per group
+    out_df = summarize_citation_tones(df)
+
+    # 3. Save summary
+    out_df.to_csv(OUTPUT_CSV, index=False, encoding="utf-8-sig")
+
+    print(f"\nCitation tone summary saved to {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
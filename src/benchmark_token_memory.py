@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 18:32:05 2026
+
+@author: xuechandai
+"""
+
+"""
+Memory benchmark: dict-of-rows vs TokenTable for extracted tokens.
+
+Builds the same synthetic corpus (N_TOKENS tokens, N_SPEAKERS speakers,
+syllable labels drawn from the stimulus inventory) twice:
+
+    rows    one dict per interval, list -> pd.DataFrame, plus the frame
+            store's token index built from per-token tuples
+            (how process_one_pair / extract_f0 used to work)
+    table   extract_f0_from_textgrid.TokenTable: preallocated float
+            columns + categorical speaker / syllable codes, and the token
+            index taken from the same columns (TokenTable.token_index)
+
+and reports the peak traced memory while building and the size of the
+final DataFrame. No audio is needed; the F0 values are random.
+
+    python src/benchmark_token_memory.py [n_tokens]
+"""
+
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from extract_f0_from_textgrid import STAT_COLUMNS, TokenTable
+
+
+N_TOKENS = 1_000_000
+N_SPEAKERS = 200
+SYLLABLES = ["妈", "麻", "马", "骂", "花", "高", "多", "天", "头", "牛",
+             "爸1", "爸2", "妈1", "妈2", "姐1", "姐2", "弟1", "弟2", "弟3", "弟4"]
+
+# ======================================================
+
+
+def synthetic_tokens(n: int, seed: int = 0):
+    """Columns of a fake extraction run (speaker / syllable as Python strings)."""
+    rng = np.random.default_rng(seed)
+    speakers = [f"participant {i:03d}" for i in range(N_SPEAKERS)]
+    spk = np.sort(rng.integers(N_SPEAKERS, size=n))
+    syl = rng.integers(len(SYLLABLES), size=n)
+    t_start = rng.uniform(0, 600, size=n)
+    stats = rng.uniform(80, 400, size=(n, len(STAT_COLUMNS)))
+    return [speakers[i] for i in spk], [SYLLABLES[i] for i in syl], t_start, stats
+
+
+def build_rows(speakers, syllables, t_start, stats) -> pd.DataFrame:
+    rows = []
+    for i in range(len(speakers)):
+        row = {
+            "speaker": speakers[i],
+            "syllable": syllables[i],
+            "t_start": float(t_start[i]),
+            "t_end": float(t_start[i]) + 0.4,
+            **{col: float(v) for col, v in zip(STAT_COLUMNS, stats[i])},
+        }
+        rows.append(row)
+    tokens = pd.DataFrame(
+        [(r["speaker"], r["syllable"], r["t_start"], r["t_end"]) for r in rows],
+        columns=["speaker", "syllable", "t_start", "t_end"],
+    )
+    df = pd.DataFrame(rows)
+    del tokens
+    return df
+
+
+def build_table(speakers, syllables, t_start, stats) -> pd.DataFrame:
+    table = TokenTable(len(speakers), features=[])
+    for i in range(len(speakers)):
+        j = table.add(speakers[i], syllables[i], t_start[i], t_start[i] + 0.4)
+        table.stats_view(j)[:] = stats[i]
+    tokens = table.token_index()
+    df = table.to_frame()
+    del tokens
+    return df
+
+
+def measure(build, inputs):
+    """Return (peak traced MB while building, final DataFrame MB, seconds)."""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    df = build(*inputs)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    final = df.memory_usage(deep=True).sum()
+    del df
+    return peak / 2**20, final / 2**20, elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else N_TOKENS
+    inputs = synthetic_tokens(n)
+
+    results = pd.DataFrame(
+        [measure(build_rows, inputs), measure(build_table, inputs)],
+        index=["dict-of-rows", "TokenTable"],
+        columns=["peak_build_MB", "dataframe_MB", "seconds"],
+    )
+
+    print(f"\n=== Token storage for {n:,} tokens ===")
+    print(results.round(1))
+    ratio = results["dataframe_MB"] / results.loc["TokenTable", "dataframe_MB"]
+    peak_ratio = results["peak_build_MB"] / results.loc["TokenTable", "peak_build_MB"]
+    print(f"\nDataFrame size reduction: {ratio['dict-of-rows']:.1f}x")
+    print(f"Peak build memory reduction: {peak_ratio['dict-of-rows']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,38 +6,235 @@ Created on Tue Dec  9 14:03:44 2025
 @author: xuechandai
 """
 
+"""
+Probability model P(surface | citation, position) for AA kinship tokens.
+
+The model is kept together with its sufficient statistics: one
+(citation x position x surface) count array per speaker plus a fingerprint
+of that speaker's AA tokens, stored in sandhi_model_counts.npz. On the next
+build only speakers whose fingerprint changed (or that are new / gone) are
+recounted; their old counts are subtracted from the pooled table, the new
+ones added, and the probabilities renormalized.
+
+Outputs:
+    data/processed/sandhi_prob_model.csv
+    data/processed/sandhi_model_counts.npz
+"""
+
 import os
+import hashlib
+
+import numpy as np
 import pandas as pd
 
-PROJECT_ROOT = "/Users/xuechandai/Desktop/guiyang_tone_sandi"
-os.chdir(PROJECT_ROOT)
 
-df = pd.read_csv("data/processed/kinship_tones_with_sandhi_info.csv")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "kinship_tones_with_sandhi_info.csv")
+OUTPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "sandhi_prob_model.csv")
+COUNTS_NPZ = os.path.join(PROJECT_ROOT, "data", "processed", "sandhi_model_counts.npz")
 
-# Keep only AA kinship tokens
 KINSHIP = ["爸","妈","姐","妹","哥","弟","爷","奶","公","姑","叔","婆","祖","舅","伯"]
-AA = df[(df["base_label"].isin(KINSHIP)) & (df["index"].isin([1, 2]))].copy()
-
-AA["citation_tone"] = AA["citation_tone"].astype(int)
-AA["surface_tone"]  = AA["surface_tone"].astype(int)
-AA["index"]         = AA["index"].astype(int)
-
-# ---------------------------------------------
-# Probability model: P(surface | citation, position)
-# ---------------------------------------------
-prob_table = (
-    AA.groupby(["citation_tone","index","surface_tone"])
-      .size()
-      .reset_index(name="count")
-)
-
-# Normalize counts into probabilities
-prob_table["prob"] = prob_table.groupby(["citation_tone","index"])["count"].transform(
-    lambda x: x / x.sum()
-)
-
-prob_table.to_csv("data/processed/sandhi_prob_model.csv", index=False, encoding="utf-8-sig")
-
-print("\n=== Probabilistic tone sandhi model ===")
-print(prob_table)
-print("\nSaved to: data/processed/sandhi_prob_model.csv")
+
+CITATIONS = [1, 2, 3, 4]
+POSITIONS = [1, 2]
+
+
+def select_aa_tokens(df: pd.DataFrame) -> pd.DataFrame:
+    """Keep only AA kinship tokens, with integer tone / position columns."""
+    AA = df[(df["base_label"].isin(KINSHIP)) & (df["index"].isin([1, 2]))].copy()
+
+    AA["citation_tone"] = AA["citation_tone"].astype(int)
+    AA["surface_tone"]  = AA["surface_tone"].astype(int)
+    AA["index"]         = AA["index"].astype(int)
+    return AA
+
+
+def _count_aa(AA: pd.DataFrame, surfaces=None):
+    AA = AA[AA["citation_tone"].isin(CITATIONS) & AA["index"].isin(POSITIONS)]
+
+    speaker_idx, speakers = pd.factorize(AA["speaker"], sort=True)
+    if surfaces is None:
+        surfaces = np.unique(AA["surface_tone"].to_numpy())
+    surfaces = np.asarray(surfaces)
+    surface_idx = np.searchsorted(surfaces, AA["surface_tone"].to_numpy())
+    citation_idx = np.searchsorted(CITATIONS, AA["citation_tone"].to_numpy())
+    position_idx = np.searchsorted(POSITIONS, AA["index"].to_numpy())
+
+    shape = (len(speakers), len(CITATIONS), len(POSITIONS), len(surfaces))
+    flat = np.ravel_multi_index((speaker_idx, citation_idx, position_idx, surface_idx), shape)
+    counts = np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+    return list(speakers), surfaces, counts
+
+
+def count_tensor(df: pd.DataFrame, surfaces=None):
+    """
+    Dense counts of AA tokens.
+
+    Returns (speakers, surfaces, counts) with counts of shape
+    (n_speakers, len(CITATIONS), len(POSITIONS), n_surfaces).
+    """
+    return _count_aa(select_aa_tokens(df), surfaces)
+
+
+def speaker_fingerprints(AA: pd.DataFrame) -> dict:
+    """Order-independent hash of each speaker's (citation, position, surface) tokens."""
+    fingerprints = {}
+    for speaker, group in AA.groupby("speaker", sort=True):
+        rows = group[["citation_tone", "index", "surface_tone"]].to_numpy(dtype=np.int64)
+        rows = rows[np.lexsort(rows.T[::-1])]
+        fingerprints[speaker] = hashlib.sha1(rows.tobytes()).hexdigest()
+    return fingerprints
+
+
+def probability_table(pooled, surfaces) -> pd.DataFrame:
+    """Rows citation_tone, index, surface_tone, count, prob for the non-zero counts."""
+    c, p, k = np.nonzero(pooled)
+    count = pooled[c, p, k]
+    totals = pooled.sum(axis=-1)
+    return pd.DataFrame({
+        "citation_tone": np.asarray(CITATIONS)[c],
+        "index": np.asarray(POSITIONS)[p],
+        "surface_tone": np.asarray(surfaces)[k],
+        "count": count.astype(np.int64),
+        "prob": count / totals[c, p],
+    })
+
+
+class SandhiCounts:
+    """
+    Per-speaker count arrays (citation x position x surface) and their sum.
+
+    Adding, replacing or removing a speaker touches only that speaker's
+    array and the pooled table.
+    """
+
+    def __init__(self, surfaces=()):
+        self.surfaces = np.unique(np.asarray(surfaces, dtype=np.int64))
+        self.counts = {}
+        self.fingerprints = {}
+        self.pooled = np.zeros(self._shape(), dtype=np.int64)
+
+    def _shape(self):
+        return (len(CITATIONS), len(POSITIONS), len(self.surfaces))
+
+    @classmethod
+    def load(cls, path: str = COUNTS_NPZ) -> "SandhiCounts":
+        """Read a saved store; a missing file gives an empty one."""
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path) as data:
+            store = cls(data["surfaces"])
+            for speaker, fp, counts in zip(data["speakers"], data["fingerprints"], data["counts"]):
+                store.set_speaker(str(speaker), counts, str(fp))
+        return store
+
+    def save(self, path: str = COUNTS_NPZ):
+        speakers = sorted(self.counts)
+        counts = (np.stack([self.counts[s] for s in speakers]) if speakers
+                  else np.zeros((0,) + self._shape(), dtype=np.int64))
+        np.savez(path, speakers=np.array(speakers, dtype=str),
+                 fingerprints=np.array([self.fingerprints[s] for s in speakers], dtype=str),
+                 surfaces=self.surfaces, counts=counts)
+
+    def add_surfaces(self, surfaces):
+        """Widen every array when new surface tones show up (rare)."""
+        merged = np.union1d(self.surfaces, np.asarray(surfaces, dtype=np.int64))
+        if len(merged) == len(self.surfaces):
+            return
+        cols = np.searchsorted(merged, self.surfaces)
+
+        def widen(a):
+            out = np.zeros(a.shape[:-1] + (len(merged),), dtype=np.int64)
+            out[..., cols] = a
+            return out
+
+        self.counts = {s: widen(a) for s, a in self.counts.items()}
+        self.pooled = widen(self.pooled)
+        self.surfaces = merged
+
+    def set_speaker(self, speaker: str, counts, fingerprint: str = None):
+        """Add a speaker, or replace their counts."""
+        counts = np.asarray(counts, dtype=np.int64)
+        old = self.counts.get(speaker)
+        if old is not None:
+            self.pooled -= old
+        self.pooled += counts
+        self.counts[speaker] = counts
+        self.fingerprints[speaker] = fingerprint
+
+    def remove_speaker(self, speaker: str):
+        self.pooled -= self.counts.pop(speaker)
+        self.fingerprints.pop(speaker, None)
+
+    def sync(self, df: pd.DataFrame) -> dict:
+        """
+        Bring the store in line with df: recount only speakers whose
+        fingerprint changed. Returns {"added": [...], "changed": [...], "removed": [...]}.
+        """
+        AA = select_aa_tokens(df)
+        AA = AA[AA["citation_tone"].isin(CITATIONS) & AA["index"].isin(POSITIONS)]
+        current = speaker_fingerprints(AA)
+
+        changes = {
+            "added": [s for s in current if s not in self.counts],
+            "changed": [s for s in current if s in self.counts and self.fingerprints[s] != current[s]],
+            "removed": [s for s in self.counts if s not in current],
+        }
+        for speaker in changes["removed"]:
+            self.remove_speaker(speaker)
+
+        recount = changes["added"] + changes["changed"]
+        if recount:
+            AA = AA[AA["speaker"].isin(recount)]
+            self.add_surfaces(AA["surface_tone"].unique())
+            speakers, _, counts = _count_aa(AA, self.surfaces)
+            for speaker, speaker_counts in zip(speakers, counts):
+                self.set_speaker(speaker, speaker_counts, current[speaker])
+        return changes
+
+    def prob_table(self) -> pd.DataFrame:
+        return probability_table(self.pooled, self.surfaces)
+
+
+def build_sandhi_model(df: pd.DataFrame) -> pd.DataFrame:
+    """Probability model: P(surface | citation, position), built from scratch."""
+    store = SandhiCounts()
+    store.sync(df)
+    return store.prob_table()
+
+
+def update_sandhi_model(df: pd.DataFrame, counts_path: str = COUNTS_NPZ):
+    """
+    Update the stored counts with df and return (prob_table, changes);
+    only new, changed or removed speakers are recounted.
+    """
+    store = SandhiCounts.load(counts_path)
+    changes = store.sync(df)
+    if any(changes.values()):
+        store.save(counts_path)
+    return store.prob_table(), changes
+
+
+def print_changes(changes: dict):
+    for kind in ["added", "changed", "removed"]:
+        if changes[kind]:
+            print(f"Speakers {kind}: {', '.join(changes[kind])}")
+    if not any(changes.values()):
+        print("No speaker changes since the last build.")
+
+
+def main():
+    prob_table, changes = update_sandhi_model(pd.read_csv(INPUT_CSV))
+    print_changes(changes)
+
+    prob_table.to_csv(OUTPUT_CSV, index=False, encoding="utf-8-sig")
+
+    print("\n=== Probabilistic tone sandhi model ===")
+    print(prob_table)
+    print(f"\nSaved to: {OUTPUT_CSV}")
+    print(f"Counts stored in: {COUNTS_NPZ}")
+
+
+if __name__ == "__main__":
+    main()
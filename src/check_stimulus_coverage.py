@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 16:48:05 2026
+
+@author: xuechandai
+"""
+
+"""
+Check which stimulus items every speaker actually produced.
+
+The stimulus list (one item per line, syllables separated by spaces, an
+optional gloss in parentheses, section headings without Chinese
+characters) is parsed once into an index of expected syllables:
+
+    item           婆婆（grandma）
+    syllable       婆
+    n_expected     2
+
+Parenthesized Chinese text is part of the item (个 个（娃 儿） expects
+个个娃儿); only non-Chinese text in parentheses is a gloss.
+
+Extracted tokens are counted per speaker and base syllable into one
+(speaker x syllable) count array, and the items take their syllables from
+it, vectorized over all speakers. Each token is used by one item only (a
+single 豆 token cannot complete 豆, 豆米 and 煮豆 at once): in stimulus
+order, tokens first go to items the speaker can complete, and leftover
+tokens then count towards the remaining items. An item's coverage is the
+share of its syllables found (1.0 = complete).
+
+Matching is therefore a Python loop over the items (vectorized over the
+speakers), not one join of tokens against items: because tokens are used
+once, what an item can take depends on what the items before it took.
+
+Speakers annotated with a word tier (word / meaning columns of
+extract_f0_from_textgrid.py) are matched on whole words instead, each
+word once: an item is covered by a word with the same syllables and, when
+both are known, the same meaning as the item's gloss (exact meaning
+matches are assigned first).
+
+Every reduplicated item of the list is also indexed like a word-tier token
+(see derive_sandhi_with_manual_tones.reduplication_position); items whose
+repeated syllables would not map onto A1 / A2 are reported.
+
+The gate only reports by default. GATE_ACTION = "drop" keeps only the
+speakers who completed at least MIN_COVERAGE of the items for the later
+stages; "stop" aborts the run instead.
+
+Outputs:
+    data/processed/stimulus_coverage.csv            speaker x item matrix
+    data/processed/stimulus_coverage_speakers.csv   one row per speaker
+"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from derive_sandhi_with_manual_tones import add_base_label_and_index, reduplication_position
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STIMULI_TXT = os.path.join(PROJECT_ROOT, "data", "raw", "stimuli", "guiyang_tone_stimuli.txt")
+INPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "f0_with_T_values.csv")
+MATRIX_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "stimulus_coverage.csv")
+SPEAKERS_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "stimulus_coverage_speakers.csv")
+
+# Share of items a speaker must have completed to pass the gate
+MIN_COVERAGE = 1.0
+# "report" only flags incomplete speakers, "drop" removes them before the
+# later stages, "stop" ends the pipeline run
+GATE_ACTION = "report"
+GATE_ACTIONS = ("report", "drop", "stop")
+
+CJK = re.compile(r"[㐀-鿿]")
+GLOSS = re.compile(r"[(（]([^()（）㐀-鿿]*)[)）]")
+BRACKETS = re.compile(r"[()（）]")
+
+# ======================================================
+
+
+def load_stimuli(path: str = STIMULI_TXT) -> pd.DataFrame:
+    """One row per distinct item: item, section, word (syllables joined), gloss, syllables."""
+    rows, section = [], None
+    with open(path, encoding="utf-8-sig") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            if not CJK.search(line):
+                section = line
+                continue
+            match = GLOSS.search(line)
+            gloss = match.group(1).strip() if match else None
+            syllables = BRACKETS.sub(" ", GLOSS.sub("", line)).split()
+            word = "".join(syllables)
+            rows.append({"item": word + (f"（{gloss}）" if gloss else ""),
+                         "section": section, "word": word, "gloss": gloss,
+                         "syllables": syllables})
+
+    items = pd.DataFrame(rows, columns=["item", "section", "word", "gloss", "syllables"])
+    return items.drop_duplicates("item").reset_index(drop=True)
+
+
+class StimulusIndex:
+    """
+    Expected syllables (and words) of a stimulus list, keyed for hash lookups.
+
+    Tokens are counted per speaker with one vectorized pass; the items then
+    take from those counts in a loop, one item at a time (see the module
+    docstring for why this is not a single merge).
+    """
+
+    def __init__(self, items: pd.DataFrame):
+        self.items = items
+        expected = (items[["item", "syllables"]].explode("syllables")
+                    .rename(columns={"syllables": "syllable"}))
+        self.expected = (expected.groupby(["item", "syllable"], sort=False).size()
+                         .rename("n_expected").reset_index())
+        self.n_syllables = items["syllables"].str.len().to_numpy()
+
+        # Per item: column indices into the syllable index and counts needed
+        self.syllables = pd.Index(self.expected["syllable"].unique())
+        item_codes = pd.Index(items["item"]).get_indexer(self.expected["item"])
+        syllable_codes = self.syllables.get_indexer(self.expected["syllable"])
+        n_expected = self.expected["n_expected"].to_numpy()
+        self.needs = [(syllable_codes[item_codes == j], n_expected[item_codes == j])
+                      for j in range(len(items))]
+
+    @classmethod
+    def from_file(cls, path: str = STIMULI_TXT) -> "StimulusIndex":
+        return cls(load_stimuli(path))
+
+    def _syllable_coverage(self, tokens: pd.DataFrame, speakers: pd.Index) -> np.ndarray:
+        """(speaker x item) share of syllables found, each token used once."""
+        spk = speakers.get_indexer(tokens["speaker"])
+        syl = self.syllables.get_indexer(tokens["base_label"])
+        known = syl >= 0
+        available = np.zeros((len(speakers), len(self.syllables)), dtype=np.int64)
+        np.add.at(available, (spk[known], syl[known]), 1)
+
+        found = np.zeros((len(speakers), len(self.items)), dtype=np.int64)
+        # Pass 1: items the speaker can complete take their tokens
+        for j, (cols, need) in enumerate(self.needs):
+            done = (available[:, cols] >= need).all(axis=1)
+            available[np.ix_(done, cols)] -= need
+            found[done, j] = need.sum()
+        # Pass 2: leftover tokens count towards the incomplete items
+        for j, (cols, need) in enumerate(self.needs):
+            todo = found[:, j] == 0
+            take = np.minimum(available[:, cols], need) * todo[:, None]
+            available[:, cols] -= take
+            found[todo, j] = take[todo].sum(axis=1)
+        return found / np.maximum(self.n_syllables, 1)
+
+    def _word_coverage(self, tokens: pd.DataFrame, speakers: pd.Index) -> np.ndarray:
+        """(speaker x item) 1.0 where a word instance covers the item, each word used once."""
+        words = tokens[tokens["word"].notna()].drop_duplicates(["speaker", "word_id"])
+        keys = pd.MultiIndex.from_arrays([
+            words["word"].astype(str).str.replace(r"\s+", "", regex=True),
+            words["meaning"].astype(object).where(words["meaning"].notna(), ""),
+        ])
+        key_codes, key_index = pd.factorize(keys)
+        available = np.zeros((len(speakers), len(key_index)), dtype=np.int64)
+        np.add.at(available, (speakers.get_indexer(words["speaker"]), key_codes), 1)
+
+        key_word = key_index.get_level_values(0).to_numpy()
+        key_meaning = key_index.get_level_values(1).to_numpy()
+        covered = np.zeros((len(speakers), len(self.items)), dtype=bool)
+        # Pass 1 takes words whose meaning equals the gloss (or both are
+        # missing), pass 2 any word whose meaning does not contradict it
+        for strict in (True, False):
+            for j, (word, gloss) in enumerate(zip(self.items["word"], self.items["gloss"])):
+                gloss = "" if pd.isna(gloss) else gloss
+                same = key_meaning == gloss
+                ok = same if strict else (same | (gloss == "") | (key_meaning == ""))
+                cols = np.flatnonzero((key_word == word) & ok)
+                if cols.size == 0:
+                    continue
+                has = (available[:, cols] > 0) & ~covered[:, [j]]
+                rows = np.flatnonzero(has.any(axis=1))
+                available[rows, cols[has[rows].argmax(axis=1)]] -= 1
+                covered[rows, j] = True
+        return covered.astype(float)
+
+    def coverage(self, tokens: pd.DataFrame) -> pd.DataFrame:
+        """
+        Speaker x item matrix of coverage (0-1) for the tokens of
+        f0_with_T_values.csv. Every item is a column, every speaker a row.
+        """
+        tokens = tokens[tokens["syllable"].notna()].copy()
+        tokens["speaker"] = tokens["speaker"].astype(str)
+        if "word" not in tokens.columns:
+            tokens["word"], tokens["word_id"], tokens["meaning"] = None, np.nan, None
+        tokens = add_base_label_and_index(tokens)
+
+        # Speakers with a word tier are matched on words, the others on syllables
+        speakers = pd.Index(list(dict.fromkeys(tokens["speaker"])))
+        by_word = tokens.groupby("speaker", sort=False)["word"].apply(lambda w: w.notna().any())
+        by_word = by_word.reindex(speakers).to_numpy(dtype=bool)
+
+        values = self._syllable_coverage(tokens, speakers)
+        if by_word.any():
+            values[by_word] = self._word_coverage(tokens, speakers)[by_word]
+
+        matrix = pd.DataFrame(values, index=speakers, columns=self.items["item"].to_numpy())
+        matrix.index.name = "speaker"
+        return matrix
+
+
+def check_reduplication(items: pd.DataFrame) -> pd.DataFrame:
+    """
+    Index every item's syllables like a word-tier token (reduplication_position)
+    and return the reduplicated items (adjacent identical syllables) whose
+    repeated syllables do not map onto A1 / A2 (e.g. a run of three).
+    """
+    syllables = items[["item", "syllables"]].explode("syllables").dropna()
+    frame = pd.DataFrame({
+        "speaker": "",
+        "word_id": items.index.get_indexer(syllables.index),
+        "position": syllables.groupby(level=0).cumcount().to_numpy() + 1,
+        "base_label": syllables["syllables"].str.replace(r"\d+", "", regex=True).to_numpy(),
+    })
+    frame["index"] = reduplication_position(frame)
+    frame["item"] = syllables["item"].to_numpy()
+    reduplicated = frame.dropna(subset=["index"])
+    bad = reduplicated.groupby("item")["index"].max() > 2
+    return items[items["item"].isin(bad[bad].index)]
+
+
+def summarize_speakers(matrix: pd.DataFrame, min_coverage: float = MIN_COVERAGE) -> pd.DataFrame:
+    """One row per speaker: items complete / partial / missing and the gate decision."""
+    complete = matrix >= 1.0
+    missing = matrix <= 0.0
+    summary = pd.DataFrame({
+        "speaker": matrix.index,
+        "n_items": matrix.shape[1],
+        "n_complete": complete.sum(axis=1).to_numpy(),
+        "n_partial": (~complete & ~missing).sum(axis=1).to_numpy(),
+        "n_missing": missing.sum(axis=1).to_numpy(),
+    })
+    summary["share_complete"] = summary["n_complete"] / max(matrix.shape[1], 1)
+    summary["passes_gate"] = summary["share_complete"] >= min_coverage
+    summary["incomplete_items"] = ["; ".join(matrix.columns[~row]) for row in complete.to_numpy()]
+    return summary
+
+
+def gate_speakers(tokens: pd.DataFrame, summary: pd.DataFrame,
+                  action: str = GATE_ACTION) -> pd.DataFrame:
+    """
+    Tokens of the speakers that pass the gate. action = "report" keeps
+    everyone; with "stop", or if "drop" leaves no speaker, raise SystemExit.
+    """
+    if action not in GATE_ACTIONS:
+        raise ValueError(f"GATE_ACTION must be one of {GATE_ACTIONS}, not {action!r}.")
+    failed = summary.loc[~summary["passes_gate"]]
+    if failed.empty:
+        print(f"✅ All {len(summary)} speakers pass the stimulus coverage gate.")
+        return tokens
+
+    for row in failed.itertuples(index=False):
+        print(f"⚠ {row.speaker}: {row.n_complete}/{row.n_items} items complete; "
+              f"incomplete: {row.incomplete_items}")
+    if action == "report":
+        print(f"{len(failed)} speaker(s) below MIN_COVERAGE kept (GATE_ACTION = 'report').")
+        return tokens
+    if action == "stop":
+        raise SystemExit(f"{len(failed)} speaker(s) below the stimulus coverage gate; stopping.")
+    if len(failed) == len(summary):
+        raise SystemExit("No speaker passes the stimulus coverage gate; nothing to process.")
+
+    keep = ~tokens["speaker"].astype(str).isin(failed["speaker"].astype(str))
+    print(f"Dropped {len(failed)} incomplete speaker(s) ({(~keep).sum()} tokens).")
+    return tokens.loc[keep].reset_index(drop=True)
+
+
+def check_coverage(tokens: pd.DataFrame, stimuli_path: str = STIMULI_TXT,
+                   min_coverage: float = MIN_COVERAGE):
+    """Return (matrix, summary) for the tokens against a stimulus list."""
+    index = StimulusIndex.from_file(stimuli_path)
+    unmapped = check_reduplication(index.items)
+    if len(unmapped):
+        print(f"⚠ {len(unmapped)} reduplicated item(s) do not map onto A1 / A2: "
+              + ", ".join(unmapped["item"]))
+    matrix = index.coverage(tokens)
+    return matrix, summarize_speakers(matrix, min_coverage)
+
+
+def save_coverage(matrix: pd.DataFrame, summary: pd.DataFrame):
+    matrix.to_csv(MATRIX_CSV, encoding="utf-8-sig")
+    summary.to_csv(SPEAKERS_CSV, index=False, encoding="utf-8-sig")
+    print(f"Saved: {MATRIX_CSV}")
+    print(f"Saved: {SPEAKERS_CSV}")
+
+
+def main():
+    matrix, summary = check_coverage(pd.read_csv(INPUT_CSV), STIMULI_TXT, MIN_COVERAGE)
+    save_coverage(matrix, summary)
+
+    print(f"\n=== Stimulus coverage ({os.path.basename(STIMULI_TXT)}, "
+          f"{matrix.shape[1]} items) ===")
+    print(summary.drop(columns="incomplete_items").round(3).to_string(index=False))
+    n_failed = int((~summary["passes_gate"]).sum())
+    if n_failed:
+        print(f"\n⚠ {n_failed} speaker(s) below MIN_COVERAGE = {MIN_COVERAGE:g}")
+    else:
+        print(f"\n✅ All speakers pass MIN_COVERAGE = {MIN_COVERAGE:g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 21:14:48 2026
+
+@author: xuechandai
+"""
+
+"""
+Leave-one-speaker-out cross-validation of the sandhi model (Step 8).
+
+For every speaker, P(surface | citation, position) is estimated from all
+other speakers and scored on the held-out speaker's AA tokens:
+
+    log_lik     sum of log P(surface | citation, position) over the tokens
+    accuracy    share of tokens whose surface tone is the most probable one
+
+The fold tables are not refitted from raw rows: with the dense count array
+of build_sandhi_model.count_tensor, the training counts of a fold
+are simply pooled counts minus the held-out speaker's counts, so the whole
+run is linear in the number of speakers. Folds are split over worker
+processes.
+
+Add-SMOOTHING counts keep tones that the other speakers never produced in a
+cell from giving a log-likelihood of -inf.
+
+Output:
+    data/processed/sandhi_model_cv.csv
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from build_sandhi_model import count_tensor
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "kinship_tones_with_sandhi_info.csv")
+OUTPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "sandhi_model_cv.csv")
+
+SMOOTHING = 0.5
+N_JOBS = os.cpu_count() or 1
+
+# ======================================================
+
+
+def fold_probabilities(train_counts, smoothing=SMOOTHING):
+    """Smoothed P(surface | citation, position) from (..., C, P, K) counts."""
+    train_counts = np.asarray(train_counts, dtype=float) + smoothing
+    return train_counts / train_counts.sum(axis=-1, keepdims=True)
+
+
+def score_folds(pooled, held_out, smoothing=SMOOTHING):
+    """
+    Score a block of folds at once.
+
+    pooled:   (C, P, K) counts of all speakers
+    held_out: (B, C, P, K) counts of the B held-out speakers
+    Returns (n_tokens, log_lik, n_correct), each of length B.
+    """
+    prob = fold_probabilities(pooled - held_out, smoothing)
+    log_lik = (held_out * np.log(prob)).sum(axis=(1, 2, 3))
+
+    # Most probable surface tone per cell of each fold
+    best = prob.argmax(axis=-1)[..., None]
+    n_correct = np.take_along_axis(held_out, best, axis=-1).sum(axis=(1, 2, 3))
+    return held_out.sum(axis=(1, 2, 3)), log_lik, n_correct
+
+
+def _score_block(args):
+    pooled, held_out, smoothing = args
+    return score_folds(pooled, held_out, smoothing)
+
+
+def cross_validate(df: pd.DataFrame, smoothing=SMOOTHING, n_jobs=N_JOBS) -> pd.DataFrame:
+    """One row per held-out speaker: n_tokens, log_lik, log_lik_per_token, accuracy."""
+    speakers, _, counts = count_tensor(df)
+    pooled = counts.sum(axis=0)
+
+    n_jobs = max(1, min(n_jobs, len(speakers)))
+    blocks = np.array_split(np.arange(len(speakers)), n_jobs)
+    tasks = [(pooled, counts[block], smoothing) for block in blocks]
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            parts = list(pool.map(_score_block, tasks))
+    else:
+        parts = [_score_block(t) for t in tasks]
+    n_tokens, log_lik, n_correct = (np.concatenate(x) for x in zip(*parts))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pd.DataFrame({
+            "speaker": speakers,
+            "n_tokens": n_tokens,
+            "log_lik": log_lik,
+            "log_lik_per_token": log_lik / n_tokens,
+            "accuracy": n_correct / n_tokens,
+        })
+
+
+def main():
+    cv = cross_validate(pd.read_csv(INPUT_CSV), smoothing=SMOOTHING, n_jobs=N_JOBS)
+    cv.to_csv(OUTPUT_CSV, index=False, encoding="utf-8-sig")
+
+    total = cv["n_tokens"].sum()
+    print(f"\n=== Leave-one-speaker-out CV ({len(cv)} folds, {total} tokens) ===")
+    print(cv.round(3).to_string(index=False))
+    if total:
+        print(f"\nPooled log-likelihood per token: {cv['log_lik'].sum() / total:.3f}")
+        print(f"Pooled accuracy: {(cv['accuracy'] * cv['n_tokens']).sum() / total:.3f}")
+    print(f"Saved to: {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
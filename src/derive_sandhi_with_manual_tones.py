@@ -10,23 +10,16 @@ import os
 import pandas as pd
 import numpy as np
 
-# 0. Change to your project root
-os.chdir("/Users/xuechandai/Desktop/guiyang_tone_sandi")
 
-# 1. Load the main labeled file
-df = pd.read_csv("data/processed/f0_with_T_values_labeled.csv")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# 2. Derive base_label and index from 'syllable'
-#    e.g. "字1" -> base_label="字", index=1
-#         "弟3" -> base_label="弟", index=3
-df["syllable"] = df["syllable"].astype(str)
-df["base_label"] = df["syllable"].str.replace(r"\d+", "", regex=True)
-df["index"] = df["syllable"].str.extract(r"(\d+)$")
-df["index"] = df["index"].astype("Int64")  # allows NaN
+INPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "f0_with_T_values_labeled.csv")
+CITATION_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "citation_tone_summary.csv")
+OUTPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "kinship_tones_with_sandhi_info.csv")
 
 
-# 3. Manual citation tones for kinship base characters (1–4)
-citation_tones = {
+# Manual citation tones for kinship base characters (1–4)
+CITATION_TONES = {
     "爸": 2,
     "妈": 1,
     "姐": 3,
@@ -45,11 +38,12 @@ citation_tones = {
 }
 
 
-# 4. Build a mapping from canonical 5-degree tones (from citation_tone_summary)
-#    to 4-way tone categories, based on the four tone groups.
-canonical_map = {}
-try:
-    cit = pd.read_csv("data/processed/citation_tone_summary.csv")
+def build_canonical_map(cit: pd.DataFrame) -> dict:
+    """
+    Build a mapping from canonical 5-degree tones (from citation_tone_summary)
+    to 4-way tone categories, based on the four tone groups.
+    """
+    canonical_map = {}
     # Expect columns: tone_group (e.g. "Tone1"), selected_tone (e.g. "55")
     for _, row in cit.iterrows():
         group_name = str(row["tone_group"])   # "Tone1", "Tone2", ...
@@ -60,14 +54,10 @@ try:
         except Exception:
             continue
         canonical_map[selected] = tone_class
-    print("Canonical tone map from citation_tone_summary:", canonical_map)
-except FileNotFoundError:
-    print("WARNING: citation_tone_summary.csv not found; canonical_map will be empty.")
-    canonical_map = {}
+    return canonical_map
 
 
-# 5. Map 5-degree contours to 4-way tone categories
-def contour_to_category(tone_str: str) -> int:
+def contour_to_category(tone_str: str, canonical_map: dict = None) -> int:
     """
     Map a 5-degree tone label (e.g. '22', '32', '11', '24', '33', '55', '42', '54', ...)
     to a 4-way tone category (1–4).
@@ -103,45 +93,128 @@ def contour_to_category(tone_str: str) -> int:
     if s == "54":
         return 3
     if s == "21":        # this assignment is unsure but since i got error for this I will mannually assign it as 5
-        return 5         
+        return 5
     if s == "34":        # this assignment is unsure but since i got error for this I will mannually assign it as 5
-        return 5 
+        return 5
 
     # 2) Use canonical map from citation_tone_summary (if exists)
-    if s in canonical_map:
+    if canonical_map and s in canonical_map:
         return canonical_map[s]
 
     # 3) Unknown contour -> force manual check
     raise ValueError(f"Unknown 5-degree contour '{s}' for mapping to 4-way tone category.")
 
 
-# 6. Attach citation_tone and surface_tone to each row
-def get_citation_tone(lbl: str):
-    return citation_tones.get(lbl, np.nan)
+def reduplication_position(df: pd.DataFrame) -> pd.Series:
+    """
+    1-based position of each syllable in its run of identical base_labels
+    inside the same word (speaker, word_id), NaN outside such runs:
+        爸 爸       -> 1, 2
+        老 婆 婆    -> NaN, 1, 2
+        汤 汤 水 水 -> 1, 2, 1, 2
+    Rows must carry base_label / word_id / position; rows without a word are NaN.
+    """
+    words = df[df["word_id"].notna()].sort_values(["speaker", "word_id", "position"])
+    key = words[["speaker", "word_id", "base_label"]]
+    new_run = (key != key.shift()).any(axis=1)
+    run = new_run.cumsum()
+    run_position = words.groupby(run).cumcount() + 1
+    run_size = run.map(run.value_counts())
+    run_position = run_position.where(run_size > 1)
+    return run_position.reindex(df.index).astype("Int64")
+
+
+def add_base_label_and_index(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add base_label (syllable without digits) and index (position in a
+    reduplicated word, NaN for other syllables) to df in place.
+
+    Tokens extracted with a word tier carry word_id / position columns;
+    index is their position in the run of identical syllables of the word
+    (see reduplication_position). When a meaning tier was annotated, the
+    words of a base_label with a second (third, ...) meaning get index 3/4
+    (5/6, ...), in order of first appearance, as in the manual labels, so
+    婆婆 (grandma) and 婆婆 (mother in law) are not pooled into A1 / A2.
+    Other tokens fall back to the digit suffix of the label:
+        "字1" -> base_label="字", index=1
+        "弟3" -> base_label="弟", index=3
+    """
+    df["syllable"] = df["syllable"].astype(str)
+    df["base_label"] = df["syllable"].str.replace(r"\d+", "", regex=True)
+    df["index"] = df["syllable"].str.extract(r"(\d+)$")[0]
+    df["index"] = df["index"].astype("Int64")  # allows NaN
+
+    if "word_id" in df.columns and "position" in df.columns:
+        in_word = df["word_id"].notna()
+        index = reduplication_position(df)
+
+        if "meaning" in df.columns:
+            meanings = df.loc[index.notna(), ["base_label", "meaning"]].dropna()
+            first_seen = meanings.drop_duplicates()
+            rank = first_seen.groupby("base_label").cumcount()
+            rank.index = pd.MultiIndex.from_frame(first_seen)
+            word_rank = pd.MultiIndex.from_frame(df[["base_label", "meaning"]])
+            offset = rank.reindex(word_rank).fillna(0).astype(int).to_numpy()
+            index = index + 2 * offset
+
+        df.loc[in_word, "index"] = index[in_word]
+    return df
+
+
+def derive_sandhi(df: pd.DataFrame, citation_summary: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Attach base_label / index / citation_tone / surface_tone to every token
+    of the labeled file.
+    """
+    df = add_base_label_and_index(df.copy())
+
+    if citation_summary is not None:
+        canonical_map = build_canonical_map(citation_summary)
+        print("Canonical tone map from citation_tone_summary:", canonical_map)
+    else:
+        print("WARNING: citation_tone_summary.csv not found; canonical_map will be empty.")
+        canonical_map = {}
+
+    # Attach citation_tone and surface_tone to each row
+    df["citation_tone"] = df["base_label"].map(CITATION_TONES).astype(float)
+    df["surface_tone"] = df["tone_5deg"].apply(contour_to_category, canonical_map=canonical_map)
+    return df
+
+
+def print_aa_check(df: pd.DataFrame):
+    """Quick check: AA positions (index = 1 / 2) for kinship characters."""
+    aa_df = df[df["index"].isin([1, 2]) & df["base_label"].isin(CITATION_TONES.keys())].copy()
+
+    print("\n=== Sample sandhi patterns (majority citation vs surface tone by base_label & position) ===\n")
+
+    if aa_df.empty:
+        print("No AA tokens with index 1/2 found. Check your labeling.")
+    else:
+        grouped = (
+            aa_df.groupby(["base_label", "index"])[["citation_tone", "surface_tone"]]
+            .agg(lambda x: x.value_counts().index[0])  # majority value
+            .reset_index()
+        )
+        print(grouped)
+
 
-df["citation_tone"] = df["base_label"].apply(get_citation_tone)
+def main():
+    # 1. Load the main labeled file
+    df = pd.read_csv(INPUT_CSV)
 
-def safe_surface_tone(x):
-    return contour_to_category(x)
+    try:
+        cit = pd.read_csv(CITATION_CSV)
+    except FileNotFoundError:
+        cit = None
 
-df["surface_tone"] = df["tone_5deg"].apply(safe_surface_tone)
+    df = derive_sandhi(df, cit)
 
-# 7. Save enriched file
-out_path = "data/processed/kinship_tones_with_sandhi_info.csv"
-df.to_csv(out_path, index=False, encoding="utf-8-sig")
-print(f"\nSaved enriched tone file with citation_tone and surface_tone:\n  {out_path}")
+    # 2. Save enriched file
+    df.to_csv(OUTPUT_CSV, index=False, encoding="utf-8-sig")
+    print(f"\nSaved enriched tone file with citation_tone and surface_tone:\n  {OUTPUT_CSV}")
 
-# 8. Quick check: AA positions (index = 1 / 2) for kinship characters
-aa_df = df[df["index"].isin([1, 2]) & df["base_label"].isin(citation_tones.keys())].copy()
+    print_aa_check(df)
 
-print("\n=== Sample sandhi patterns (majority citation vs surface tone by base_label & position) ===\n")
 
-if aa_df.empty:
-    print("No AA tokens with index 1/2 found. Check your labeling.")
-else:
-    grouped = (
-        aa_df.groupby(["base_label", "index"])[["citation_tone", "surface_tone"]]
-        .agg(lambda x: x.value_counts().index[0])  # majority value
-        .reset_index()
-    )
-    print(grouped)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 20:05:12 2026
+
+@author: xuechandai
+"""
+
+"""
+Hierarchical speaker-level sandhi model.
+
+build_sandhi_model.py pools every token, so a speaker with many tokens
+dominates P(surface | citation, position). Here each speaker s has their own
+distribution per (citation, position) cell,
+
+    theta[s, c, p]  ~ Dirichlet(alpha[c, p])
+    n[s, c, p, :]   ~ Multinomial(N[s, c, p], theta[s, c, p])
+
+and the population parameters alpha[c, p] (= concentration x mean table) are
+fitted by Minka's fixed-point iteration for the Dirichlet-multinomial, which
+is an EM-style update. All speakers and cells are updated at once on a dense
+(speaker x citation x position x surface) count array.
+
+Per-speaker tables are the posterior means
+
+    (n[s, c, p] + alpha[c, p]) / (N[s, c, p] + sum(alpha[c, p]))
+
+i.e. the speaker's own proportions shrunk toward the population table; the
+fewer tokens a speaker has in a cell, the stronger the shrinkage.
+
+Outputs (same columns as sandhi_prob_model.csv, so simulate_sandhi.py can
+use either):
+    data/processed/sandhi_hier_population.csv
+    data/processed/sandhi_hier_speakers.csv     (+ speaker column)
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from build_sandhi_model import CITATIONS, POSITIONS, count_tensor
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "kinship_tones_with_sandhi_info.csv")
+POPULATION_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "sandhi_hier_population.csv")
+SPEAKERS_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "sandhi_hier_speakers.csv")
+
+MAX_ITER = 1000
+TOL = 1e-6
+INIT_CONCENTRATION = 10.0
+MIN_ALPHA = 1e-6
+# A cell seen in one speaker only (or with no between-speaker spread) has
+# no finite concentration estimate; cap it so it falls back to pooling.
+MAX_CONCENTRATION = 1e4
+
+# ======================================================
+
+
+def _digamma(x):
+    """Elementwise digamma for x > 0 (recurrence up to x >= 6, then asymptotic series)."""
+    x = np.array(x, dtype=float)
+    result = np.zeros_like(x)
+    for _ in range(6):
+        small = x < 6
+        result -= np.where(small, 1.0 / x, 0.0)
+        x = np.where(small, x + 1.0, x)
+    inv2 = 1.0 / (x * x)
+    return result + np.log(x) - 0.5 / x - inv2 * (1 / 12 - inv2 * (1 / 120 - inv2 / 252))
+
+
+def fit_hierarchical_model(counts, max_iter=MAX_ITER, tol=TOL):
+    """
+    Fit the Dirichlet parameters alpha (shape counts.shape[1:]) of every cell
+    at once. Returns (alpha, n_iter).
+    """
+    counts = np.asarray(counts, dtype=float)
+    totals = counts.sum(axis=-1)                                   # (S, C, P)
+
+    # Start from the unweighted mean of the speakers' own proportions
+    with np.errstate(invalid="ignore", divide="ignore"):
+        props = counts / totals[..., None]
+    has_data = totals > 0
+    n_speakers = has_data.sum(axis=0)[..., None]                    # (C, P, 1)
+    mean = np.where(has_data[..., None], props, 0.0).sum(axis=0)
+    mean = np.where(n_speakers > 0, mean / np.maximum(n_speakers, 1), 1.0 / counts.shape[-1])
+    alpha = np.maximum(INIT_CONCENTRATION * mean, MIN_ALPHA)
+
+    for n_iter in range(1, max_iter + 1):
+        A = alpha.sum(axis=-1)                                      # (C, P)
+        num = (_digamma(counts + alpha) - _digamma(alpha)).sum(axis=0)
+        den = (_digamma(totals + A) - _digamma(A)).sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            new = alpha * num / den[..., None]
+        # Cells without any tokens keep their starting values
+        new = np.where(den[..., None] > 0, new, alpha)
+        new = np.maximum(new, MIN_ALPHA)
+
+        scale = MAX_CONCENTRATION / new.sum(axis=-1, keepdims=True)
+        new = np.where(scale < 1, new * scale, new)
+
+        change = np.max(np.abs(new - alpha) / alpha)
+        alpha = new
+        if change < tol:
+            break
+    return alpha, n_iter
+
+
+def speaker_posteriors(counts, alpha):
+    """Posterior-mean P(surface | citation, position) per speaker, shape of counts."""
+    counts = np.asarray(counts, dtype=float)
+    return (counts + alpha) / (counts.sum(axis=-1, keepdims=True) + alpha.sum(axis=-1, keepdims=True))
+
+
+def _long_table(probs, counts, surfaces):
+    """(…, C, P, K) arrays -> rows citation_tone, index, surface_tone, count, prob."""
+    grid = np.stack(np.meshgrid(CITATIONS, POSITIONS, surfaces, indexing="ij"), axis=-1)
+    grid = np.broadcast_to(grid, probs.shape[:-3] + grid.shape)
+    return pd.DataFrame({
+        "citation_tone": grid[..., 0].ravel(),
+        "index": grid[..., 1].ravel(),
+        "surface_tone": grid[..., 2].ravel(),
+        "count": np.broadcast_to(counts, probs.shape).ravel().astype(int),
+        "prob": probs.ravel(),
+    })
+
+
+def model_tables(speakers, surfaces, counts, alpha):
+    """
+    Population and per-speaker tables in the sandhi_prob_model.csv format.
+
+    Only (cell, surface) combinations observed in the pooled data are kept
+    and probabilities are renormalized over them, so every row is a
+    surface tone the simulation can actually draw.
+    """
+    pooled = counts.sum(axis=0)
+    observed = pooled > 0
+
+    population = np.where(observed, alpha, 0.0)
+    population = population / np.maximum(population.sum(axis=-1, keepdims=True), 1e-300)
+    pop_table = _long_table(population, pooled, surfaces)
+    pop_table = pop_table[observed.ravel()].reset_index(drop=True)
+
+    post = np.where(observed, speaker_posteriors(counts, alpha), 0.0)
+    post = post / np.maximum(post.sum(axis=-1, keepdims=True), 1e-300)
+    spk_table = _long_table(post, counts, surfaces)
+    spk_table.insert(0, "speaker", np.repeat(speakers, observed.size))
+    spk_table = spk_table[np.tile(observed.ravel(), len(speakers))].reset_index(drop=True)
+    return pop_table, spk_table
+
+
+def build_hierarchical_model(df: pd.DataFrame):
+    """Fit the model on the kinship dataset. Returns (population_table, speaker_table)."""
+    speakers, surfaces, counts = count_tensor(df)
+    alpha, n_iter = fit_hierarchical_model(counts)
+    print(f"Fitted {len(speakers)} speakers x {alpha.shape[0] * alpha.shape[1]} cells "
+          f"in {n_iter} iterations")
+    return model_tables(speakers, surfaces, counts, alpha)
+
+
+def main():
+    population, speakers = build_hierarchical_model(pd.read_csv(INPUT_CSV))
+
+    population.to_csv(POPULATION_CSV, index=False, encoding="utf-8-sig")
+    speakers.to_csv(SPEAKERS_CSV, index=False, encoding="utf-8-sig")
+
+    print("\n=== Hierarchical sandhi model (population) ===")
+    print(population)
+    print(f"\nSaved to: {POPULATION_CSV}")
+    print(f"Saved to: {SPEAKERS_CSV}")
+
+
+if __name__ == "__main__":
+    main()
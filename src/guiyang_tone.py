@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 16:41:52 2026
+
+@author: xuechandai
+"""
+
+"""
+Single command-line entry point for the whole pipeline.
+
+    guiyang-tone run [--from STAGE] [--to STAGE] [--gate report|drop|stop]
+    guiyang-tone extract | coverage | label | citation | sandhi | summarize | analyze
+    guiyang-tone model | simulate | compare | plot | cluster | sweep | hierarchical | cv | serve | contours | normalize
+
+Every stage is an importable function in its own module under src/.
+Stage modules are imported only when their command runs, and parselmouth /
+matplotlib are imported only inside the functions that need them, so e.g.
+`guiyang-tone label` or `guiyang-tone model` never load them.
+
+`run` chains the stages in memory: each stage's DataFrame is handed to the
+next one directly (outputs are still written to data/processed/ as before).
+With --from, the inputs of the first stage are read from their CSV files.
+"""
+
+import argparse
+import sys
+
+
+# Pipeline order used by `run`
+STAGES = [
+    "extract",    # Step 1: F0 extraction
+    "coverage",   # Step 1b: stimulus coverage gate
+    "label",      # Step 2: 5-degree tone labels
+    "citation",   # Step 3: citation tone values
+    "sandhi",     # Step 4: AA sandhi dataset
+    "summarize",  # Step 5: clean AA sandhi summary
+    "analyze",    # Step 6: exploratory analysis
+    "plot",       # Step 7: sandhi figures
+    "model",      # Step 8: P(surface | citation, position)
+    "simulate",   # Step 9: Monte Carlo simulation
+    "compare",    # Step 10: simulated vs empirical
+]
+
+
+class Pipeline:
+    """
+    Holds the DataFrames produced so far. A frame that has not been
+    produced in this run is read from its CSV file on first use.
+    """
+
+    def __init__(self, seed=None):
+        self.frames = {}
+        self.seed = seed
+
+    def _csv_path(self, key):
+        import label_tones_5degree as label
+        import derive_sandhi_with_manual_tones as sandhi
+        import build_sandhi_model as model
+        import simulate_sandhi as simulate
+        import fit_hierarchical_sandhi_model as hier
+
+        return {
+            "f0": label.INPUT_CSV,
+            "labeled": label.OUTPUT_CSV,
+            "citation": sandhi.CITATION_CSV,
+            "kinship": sandhi.OUTPUT_CSV,
+            "model": model.OUTPUT_CSV,
+            "simulation": simulate.OUTPUT_CSV,
+            "hier_population": hier.POPULATION_CSV,
+            "hier_speakers": hier.SPEAKERS_CSV,
+        }[key]
+
+    def get(self, key):
+        if key not in self.frames:
+            import pandas as pd
+            self.frames[key] = pd.read_csv(self._csv_path(key))
+        return self.frames[key]
+
+    def put(self, key, df, save=True):
+        self.frames[key] = df
+        if save:
+            path = self._csv_path(key)
+            df.to_csv(path, index=False,
+                      encoding=None if key == "simulation" else "utf-8-sig")
+            print(f"Saved: {path}")
+
+    # --- stages ---------------------------------------------------------
+
+    def extract(self):
+        import extract_f0_from_textgrid as extract
+
+        df, ranges = extract.extract_f0()
+        if df is None:
+            raise SystemExit("Extraction produced no tokens; use `run --from label` "
+                             "to start from the existing f0_with_T_values.csv.")
+        extract.save_outputs(df, ranges)
+        self.frames["f0"] = df
+
+    def coverage(self):
+        import check_stimulus_coverage as cov
+
+        tokens = self.get("f0")
+        matrix, summary = cov.check_coverage(tokens, cov.STIMULI_TXT, cov.MIN_COVERAGE)
+        cov.save_coverage(matrix, summary)
+        # Later stages only see the speakers that pass the gate
+        self.frames["f0"] = cov.gate_speakers(tokens, summary, cov.GATE_ACTION)
+
+    def label(self):
+        from label_tones_5degree import label_tones
+        self.put("labeled", label_tones(self.get("f0")))
+
+    def citation(self):
+        from summarize_citation_tones import summarize_citation_tones
+        self.put("citation", summarize_citation_tones(self.get("labeled")))
+
+    def sandhi(self):
+        import derive_sandhi_with_manual_tones as sandhi
+
+        try:
+            cit = self.get("citation")
+        except FileNotFoundError:
+            cit = None
+        df = sandhi.derive_sandhi(self.get("labeled"), cit)
+        self.put("kinship", df)
+        sandhi.print_aa_check(df)
+
+    def summarize(self):
+        import summarize_AA_sandhi_clean as summ
+
+        summary_char, summary_global = summ.summarize_aa_sandhi(self.get("kinship"))
+        summary_char.to_csv(summ.OUTPUT_CHAR_CSV, index=False, encoding="utf-8-sig")
+        summary_global.to_csv(summ.OUTPUT_GLOBAL_CSV, index=False, encoding="utf-8-sig")
+
+    def analyze(self):
+        import analyze_AA_sandhi as analyze
+
+        out = analyze.analyze_aa_sandhi(self.get("labeled"))
+        out.to_csv(analyze.OUTPUT_CSV, index=False, encoding="utf-8-sig")
+        print(f"\nSaved AA sandhi patterns to {analyze.OUTPUT_CSV}")
+
+    def model(self):
+        import build_sandhi_model as model
+
+        prob_table, changes = model.update_sandhi_model(self.get("kinship"))
+        model.print_changes(changes)
+        print("\n=== Probabilistic tone sandhi model ===")
+        print(prob_table)
+        self.put("model", prob_table)
+
+    def hierarchical(self):
+        from fit_hierarchical_sandhi_model import build_hierarchical_model
+
+        population, speakers = build_hierarchical_model(self.get("kinship"))
+        print("\n=== Hierarchical sandhi model (population) ===")
+        print(population)
+        self.put("hier_population", population)
+        self.put("hier_speakers", speakers)
+
+    def simulate(self, n=None, model="pooled", speaker=None):
+        import simulate_sandhi as simulate
+
+        if speaker is not None:
+            prob = self.get("hier_speakers")
+        elif model == "hierarchical":
+            prob = self.get("hier_population")
+        else:
+            prob = self.get("model")
+        sim_df = simulate.simulate_sandhi(prob, n or simulate.N, seed=self.seed, speaker=speaker)
+        print(sim_df.head())
+        self.put("simulation", sim_df)
+
+    def compare(self):
+        import compare_sim_vs_empirical as compare
+
+        sim, emp = self.get("simulation"), self.get("kinship")
+        compare.plot_sim_vs_empirical(sim, emp)
+        stats = compare.compare_distributions(sim, emp, seed=self.seed)
+        stats.to_csv(compare.STATS_CSV, index=False, encoding="utf-8-sig")
+        print(stats.round(4).to_string(index=False))
+        print(f"Saved: {compare.STATS_CSV}")
+
+    def plot(self):
+        from plot_tone_sandhi_all import plot_tone_sandhi_all
+        plot_tone_sandhi_all(self.get("kinship"))
+
+
+def run_pipeline(start=STAGES[0], stop=STAGES[-1], seed=None):
+    """Run the stages from `start` to `stop` (inclusive), passing frames in memory."""
+    stages = STAGES[STAGES.index(start):STAGES.index(stop) + 1]
+    pipeline = Pipeline(seed=seed)
+    for i, stage in enumerate(stages, 1):
+        print(f"\n=== [{i}/{len(stages)}] {stage} ===")
+        getattr(pipeline, stage)()
+    print("\n🎉 ALL STEPS COMPLETED — Pipeline Finished Successfully!")
+    return pipeline
+
+
+def _run_coverage(args):
+    import check_stimulus_coverage as cov
+    if args.stimuli:
+        cov.STIMULI_TXT = args.stimuli
+    if args.min_coverage is not None:
+        cov.MIN_COVERAGE = args.min_coverage
+    cov.main()
+
+
+def _run_cluster(args):
+    import induce_tone_clusters as cluster
+    if args.method:
+        cluster.METHOD = args.method
+    if args.k:
+        cluster.N_CLUSTERS = args.k
+    if args.jobs:
+        cluster.N_JOBS = args.jobs
+    cluster.main()
+
+
+def _run_sweep(args):
+    import sweep_label_thresholds as sweep
+    if args.jobs:
+        sweep.N_JOBS = args.jobs
+    sweep.main()
+
+
+def _run_cv(args):
+    import cross_validate_sandhi_model as cv
+    if args.jobs:
+        cv.N_JOBS = args.jobs
+    cv.main()
+
+
+def _run_serve(args):
+    import sandhi_query_service as service
+    service.serve(args.host, args.port)
+
+
+def _run_contours(args):
+    import render_token_contours as contours
+    if args.jobs:
+        contours.N_JOBS = args.jobs
+    contours.main()
+
+
+def _run_normalize(args):
+    import normalize_stream as normalize
+    if args.register:
+        normalize.REGISTER = args.register
+    if args.percentiles:
+        normalize.ROBUST_PERCENTILES = tuple(args.percentiles)
+    if args.chunk_size:
+        normalize.CHUNK_SIZE = args.chunk_size
+    normalize.main()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="guiyang-tone",
+        description="Guiyang Mandarin tone sandhi pipeline.",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="run the pipeline, passing data between stages in memory")
+    p.add_argument("--from", dest="start", choices=STAGES, default=STAGES[0],
+                   help="first stage (its inputs are read from disk)")
+    p.add_argument("--to", dest="stop", choices=STAGES, default=STAGES[-1],
+                   help="last stage")
+    p.add_argument("--seed", type=int, default=None, help="random seed for the simulation")
+    p.add_argument("--gate", choices=["report", "drop", "stop"], default=None,
+                   help="what the coverage stage does with incomplete speakers")
+
+    for stage, help_text in [
+        ("extract", "extract F0 + T-values from audio and TextGrids"),
+        ("label", "convert T-values to 5-degree tone labels"),
+        ("citation", "determine citation tone values from monosyllables"),
+        ("sandhi", "build the sandhi dataset using manual citation tones"),
+        ("summarize", "summarize the clean AA sandhi data"),
+        ("analyze", "exploratory AA sandhi statistics"),
+        ("plot", "generate all sandhi figures"),
+        ("model", "build the probabilistic sandhi model"),
+        ("simulate", "Monte Carlo simulation from the sandhi model"),
+        ("compare", "compare simulated vs empirical surface tones"),
+    ]:
+        p = sub.add_parser(stage, help=help_text)
+        if stage == "simulate":
+            p.add_argument("-n", type=int, default=None, help="number of simulated tokens")
+            p.add_argument("--seed", type=int, default=None, help="random seed")
+            p.add_argument("--model", choices=["pooled", "hierarchical"], default="pooled",
+                           help="pooled model (Step 8) or hierarchical population table")
+            p.add_argument("--speaker", default=None,
+                           help="simulate one speaker from the hierarchical model")
+
+    p = sub.add_parser("coverage", help="speaker x stimulus item coverage matrix")
+    p.add_argument("--stimuli", default=None, help="stimulus list (txt)")
+    p.add_argument("--min-coverage", type=float, default=None,
+                   help="share of complete items a speaker needs to pass the gate")
+
+    sub.add_parser("hierarchical", help="fit the hierarchical speaker-level sandhi model")
+
+    p = sub.add_parser("cv", help="leave-one-speaker-out cross-validation of the sandhi model")
+    p.add_argument("--jobs", type=int, default=None, help="worker processes")
+
+    p = sub.add_parser("serve", help="local HTTP/JSON service for sandhi predictions")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+
+    p = sub.add_parser("contours", help="per-token F0 contour thumbnails + HTML contact sheet")
+    p.add_argument("--jobs", type=int, default=None, help="worker processes")
+
+    p = sub.add_parser("normalize", help="out-of-core T-values + labels (replaces `label` for large corpora)")
+    p.add_argument("--register", choices=["global", "speaker"], default=None)
+    p.add_argument("--percentiles", type=float, nargs=2, metavar=("LOW", "HIGH"), default=None,
+                   help="use these f0_mean percentiles as the register instead of min / max")
+    p.add_argument("--chunk-size", type=int, default=None, help="rows per chunk")
+
+    p = sub.add_parser("cluster", help="data-driven tone clusters vs rule-based labels")
+    p.add_argument("--method", choices=["kmeans", "gmm"], default=None)
+    p.add_argument("-k", type=int, default=None, help="number of clusters")
+    p.add_argument("--jobs", type=int, default=None, help="worker processes for restarts")
+
+    p = sub.add_parser("sweep", help="sweep pitch range and labeling thresholds")
+    p.add_argument("--jobs", type=int, default=None, help="worker processes")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == "run":
+        if STAGES.index(args.start) > STAGES.index(args.stop):
+            raise SystemExit(f"--from {args.start} comes after --to {args.stop}")
+        if args.gate:
+            import check_stimulus_coverage as cov
+            cov.GATE_ACTION = args.gate
+        run_pipeline(args.start, args.stop, seed=args.seed)
+    elif args.command == "coverage":
+        _run_coverage(args)
+    elif args.command == "cluster":
+        _run_cluster(args)
+    elif args.command == "sweep":
+        _run_sweep(args)
+    elif args.command == "cv":
+        _run_cv(args)
+    elif args.command == "serve":
+        _run_serve(args)
+    elif args.command == "contours":
+        _run_contours(args)
+    elif args.command == "normalize":
+        _run_normalize(args)
+    else:
+        pipeline = Pipeline(seed=getattr(args, "seed", None))
+        if args.command == "simulate":
+            pipeline.simulate(n=args.n, model=args.model, speaker=args.speaker)
+        else:
+            getattr(pipeline, args.command)()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 14:26:40 2026
+
+@author: xuechandai
+"""
+
+"""
+Out-of-core T-value normalization and tone labeling.
+
+compute_T_values needs the register (max / min f0_mean) of the whole
+corpus before any T-value can be computed, so the whole table has to be in
+memory. This script does the same in two passes over the CSV, CHUNK_SIZE
+rows at a time:
+
+    pass 1  running min / max of f0_mean per speaker, plus (optionally) a
+            log-spaced histogram per speaker, from which percentiles are
+            read with a relative error below one bin width (< 0.3 %)
+    pass 2  T-values from the register, 5-degree labels, and the chunk is
+            appended to the output file
+
+REGISTER = "global" uses one register for all speakers, as compute_T_values
+does; "speaker" gives every speaker their own register.
+ROBUST_PERCENTILES = (low, high) uses those percentiles of f0_mean as the
+register instead of min / max.
+
+Memory use is bounded by the chunk size and the number of speakers.
+
+Outputs:
+    data/processed/f0_with_T_values_labeled.csv
+    data/processed/speaker_registers.csv
+"""
+
+import os
+import math
+
+import numpy as np
+import pandas as pd
+
+from extract_f0_from_textgrid import apply_T_values
+from label_tones_5degree import label_tones
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "f0_with_T_values.csv")
+OUTPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "f0_with_T_values_labeled.csv")
+REGISTERS_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "speaker_registers.csv")
+
+CHUNK_SIZE = 200_000
+REGISTER = "global"          # "global" or "speaker"
+ROBUST_PERCENTILES = None    # e.g. (1, 99); None = min / max
+
+# Percentile sketch: log-spaced F0 bins
+SKETCH_MIN_HZ = 20.0
+SKETCH_MAX_HZ = 2000.0
+SKETCH_BINS = 1600
+
+LEVEL_THRESH = 1.0
+MAX_STEP = 2
+
+# ======================================================
+
+
+class RegisterSketch:
+    """Running per-speaker count / min / max (and histogram) of f0_mean."""
+
+    def __init__(self, percentiles=ROBUST_PERCENTILES):
+        self.percentiles = percentiles
+        self.speakers = {}
+        self.count = np.zeros(0, dtype=np.int64)
+        self.f0_min = np.zeros(0)
+        self.f0_max = np.zeros(0)
+        self.hist = np.zeros((0, SKETCH_BINS), dtype=np.int64)
+        self.edges = np.geomspace(SKETCH_MIN_HZ, SKETCH_MAX_HZ, SKETCH_BINS + 1)
+
+    def _grow(self, n):
+        extra = n - len(self.count)
+        if extra > 0:
+            self.count = np.concatenate([self.count, np.zeros(extra, dtype=np.int64)])
+            self.f0_min = np.concatenate([self.f0_min, np.full(extra, np.inf)])
+            self.f0_max = np.concatenate([self.f0_max, np.full(extra, -np.inf)])
+            if self.percentiles is not None:
+                self.hist = np.vstack([self.hist, np.zeros((extra, SKETCH_BINS), dtype=np.int64)])
+
+    def update(self, speakers, f0):
+        """Add one chunk (arrays of speaker names and f0_mean values)."""
+        f0 = np.asarray(f0, dtype=np.float64)
+        keep = f0 > 0                      # also drops NaN
+        speakers, f0 = np.asarray(speakers)[keep], f0[keep]
+        if f0.size == 0:
+            return
+
+        local_codes, names = pd.factorize(speakers)
+        codes = np.array([self.speakers.setdefault(s, len(self.speakers)) for s in names])[local_codes]
+        self._grow(len(self.speakers))
+
+        self.count += np.bincount(codes, minlength=len(self.count))
+        np.minimum.at(self.f0_min, codes, f0)
+        np.maximum.at(self.f0_max, codes, f0)
+        if self.percentiles is not None:
+            bins = np.clip(np.searchsorted(self.edges, f0, side="right") - 1, 0, SKETCH_BINS - 1)
+            np.add.at(self.hist, (codes, bins), 1)
+
+    def _quantile(self, hist, q):
+        """Approximate q-th percentile from histogram counts (geometric bin centers)."""
+        cum = np.cumsum(hist)
+        k = np.searchsorted(cum, q / 100.0 * cum[-1], side="left")
+        k = min(k, SKETCH_BINS - 1)
+        return math.sqrt(self.edges[k] * self.edges[k + 1])
+
+    def registers(self, mode: str = REGISTER) -> pd.DataFrame:
+        """One row per speaker with n, f0_min, f0_max and the register (b, a) used."""
+        names = list(self.speakers)
+        if not names:
+            raise ValueError("No voiced f0_mean values found; cannot set a register.")
+        out = pd.DataFrame({"speaker": names, "n_voiced_tokens": self.count,
+                            "f0_min": self.f0_min, "f0_max": self.f0_max})
+
+        if mode == "global":
+            if self.percentiles is None:
+                low, high = self.f0_min.min(), self.f0_max.max()
+            else:
+                pooled = self.hist.sum(axis=0)
+                low, high = (self._quantile(pooled, q) for q in self.percentiles)
+            out["register_low"], out["register_high"] = low, high
+        elif mode == "speaker":
+            if self.percentiles is None:
+                out["register_low"], out["register_high"] = self.f0_min, self.f0_max
+            else:
+                out["register_low"] = [self._quantile(h, self.percentiles[0]) for h in self.hist]
+                out["register_high"] = [self._quantile(h, self.percentiles[1]) for h in self.hist]
+        else:
+            raise ValueError(f"REGISTER must be 'global' or 'speaker', not {mode!r}.")
+        return out
+
+
+def collect_registers(path: str = INPUT_CSV, chunk_size: int = CHUNK_SIZE,
+                      mode: str = REGISTER, percentiles=ROBUST_PERCENTILES) -> pd.DataFrame:
+    """Pass 1: read only speaker / f0_mean and build the register table."""
+    sketch = RegisterSketch(percentiles)
+    for chunk in pd.read_csv(path, usecols=["speaker", "f0_mean"], chunksize=chunk_size):
+        sketch.update(chunk["speaker"].astype(str).to_numpy(), chunk["f0_mean"].to_numpy())
+    return sketch.registers(mode)
+
+
+def normalize_and_label(path: str = INPUT_CSV, out_path: str = OUTPUT_CSV,
+                        registers: pd.DataFrame = None, chunk_size: int = CHUNK_SIZE,
+                        level_thresh=LEVEL_THRESH, max_step=MAX_STEP) -> int:
+    """Pass 2: T-values + tone labels chunk by chunk. Returns the number of rows written."""
+    if registers is None:
+        registers = collect_registers(path, chunk_size, REGISTER, ROBUST_PERCENTILES)
+    reg = registers.set_index("speaker")
+    log_b = np.log10(reg["register_low"])
+    log_range = np.log10(reg["register_high"]) - log_b
+
+    n_rows = 0
+    with open(out_path, "w", encoding="utf-8-sig", newline="") as fh:
+        for chunk in pd.read_csv(path, chunksize=chunk_size):
+            speakers = chunk["speaker"].astype(str)
+            # Speakers without any voiced token get NaN T-values
+            apply_T_values(chunk, speakers.map(log_b).to_numpy(dtype=np.float64),
+                           speakers.map(log_range).to_numpy(dtype=np.float64))
+            chunk = label_tones(chunk, level_thresh=level_thresh, max_step=max_step)
+            chunk.to_csv(fh, index=False, header=(n_rows == 0))
+            n_rows += len(chunk)
+    return n_rows
+
+
+def main():
+    # Module settings are read here, not bound as defaults, so the CLI can set them
+    registers = collect_registers(INPUT_CSV, CHUNK_SIZE, REGISTER, ROBUST_PERCENTILES)
+    registers.to_csv(REGISTERS_CSV, index=False, encoding="utf-8-sig")
+    print(f"\n=== Registers ({REGISTER}, "
+          f"{'min / max' if ROBUST_PERCENTILES is None else f'percentiles {ROBUST_PERCENTILES}'}) ===")
+    print(registers.round(2).to_string(index=False))
+
+    n_rows = normalize_and_label(INPUT_CSV, OUTPUT_CSV, registers, CHUNK_SIZE,
+                                 level_thresh=LEVEL_THRESH, max_step=MAX_STEP)
+    print(f"\n✅ Normalized and labeled {n_rows} tokens in chunks of {CHUNK_SIZE}")
+    print(f"Saved to: {OUTPUT_CSV}")
+    print(f"Registers saved to: {REGISTERS_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 09:12:26 2026
+
+@author: xuechandai
+"""
+
+"""
+One small F0 contour plot per token, for checking the tone labels.
+
+Each thumbnail shows the token's pitch contour on the T-value scale (0–5),
+the T_start / T_mean / T_end points and the assigned tone_5deg label. The
+contour uses the registers of data/processed/speaker_registers.csv when
+normalize_stream.py wrote one (per speaker, or percentile-based), and
+otherwise the global f0_mean min / max of compute_T_values. All thumbnails are listed in an HTML
+contact sheet.
+
+Pitch comes from the pitch track cache of extract_f0_from_textgrid.py
+(one track per speaker, recomputed only if missing), never per token. The
+tokens are split over worker processes; every worker draws into one
+figure that it creates once and only updates the artists' data and
+texts before each savefig.
+
+Outputs:
+    data/figures/token_contours/<speaker>/<row>.png
+    data/figures/token_contours/index.html
+"""
+
+import os
+import html
+import math
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+import extract_f0_from_textgrid as extract
+from normalize_stream import REGISTERS_CSV
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "f0_with_T_values_labeled.csv")
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, "data", "figures", "token_contours")
+INDEX_HTML = os.path.join(OUTPUT_DIR, "index.html")
+
+THUMB_SIZE = (2.4, 1.8)   # inches
+THUMB_DPI = 80
+# Time shown around each token, as a fraction of its duration
+CONTEXT = 0.1
+
+N_JOBS = os.cpu_count() or 1
+TOKENS_PER_TASK = 500
+
+# ======================================================
+
+
+# Per-process figure, created on first use
+_figure = None
+
+
+def _get_figure():
+    global _figure
+    if _figure is None:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        # Fall back to the default font (no CJK glyphs) instead of warning per token
+        matplotlib.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'Noto Sans CJK SC', 'DejaVu Sans']
+        matplotlib.rcParams['axes.unicode_minus'] = False
+
+        fig, ax = plt.subplots(figsize=THUMB_SIZE, dpi=THUMB_DPI)
+        fig.subplots_adjust(left=0.12, right=0.97, bottom=0.14, top=0.84)
+        ax.set_ylim(-0.5, 5.5)
+        ax.set_yticks([0, 1, 2, 3, 4, 5])
+        ax.grid(axis="y", linewidth=0.5, alpha=0.5)
+        ax.tick_params(labelsize=6)
+
+        contour, = ax.plot([], [], color="tab:blue", linewidth=1.2)
+        points, = ax.plot([], [], "o", color="tab:red", markersize=3)
+        span = ax.axvspan(0, 1, color="0.9", zorder=0)
+        title = ax.set_title("", fontsize=8)
+        _figure = {"fig": fig, "ax": ax, "contour": contour,
+                   "points": points, "span": span, "title": title}
+    return _figure
+
+
+def _draw_token(f, xs, T_track, row, path):
+    """Update the worker's artists for one token and save the figure."""
+    t0, t1 = row["t_start"], row["t_end"]
+    pad = CONTEXT * (t1 - t0)
+    lo, hi = np.searchsorted(xs, [t0 - pad, t1 + pad])
+
+    f["contour"].set_data(xs[lo:hi], T_track[lo:hi])
+    f["points"].set_data([t0, 0.5 * (t0 + t1), t1],
+                         [row["T_start"], row["T_mean"], row["T_end"]])
+    f["span"].set_x(t0)
+    f["span"].set_width(t1 - t0)
+    f["ax"].set_xlim(t0 - pad, t1 + pad if t1 > t0 else t0 + 0.01)
+    label = row["tone_5deg"]
+    label = "–" if pd.isna(label) else str(label)
+    f["title"].set_text(f"{row['syllable']}  {label}")
+    f["fig"].savefig(path)
+
+
+def _render_task(args):
+    """Render one speaker's block of tokens; returns the relative image paths."""
+    audio_path, floor, ceiling, (log_b, log_range), tokens, out_dir = args
+    xs, ys = extract.load_pitch_track(audio_path, floor, ceiling)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        T_track = np.where(ys > 0, 5 * (np.log10(ys) - log_b) / log_range, np.nan)
+
+    f = _get_figure()
+    paths = []
+    for row in tokens:
+        rel = os.path.join(row["speaker"], f"{row['row']:06d}.png")
+        _draw_token(f, xs, T_track, row, os.path.join(out_dir, rel))
+        paths.append(rel)
+    return paths
+
+
+def write_index(tokens: pd.DataFrame, path: str = INDEX_HTML):
+    """Contact sheet: one captioned thumbnail per token."""
+    cells = []
+    for row in tokens.itertuples(index=False):
+        label = "–" if pd.isna(row.tone_5deg) else row.tone_5deg
+        caption = (f"{html.escape(str(row.syllable))} · {html.escape(str(label))}<br>"
+                   f"<small>{html.escape(str(row.speaker))} #{row.row} · "
+                   f"T {row.T_start:.1f} / {row.T_mean:.1f} / {row.T_end:.1f}</small>")
+        cells.append(f'<figure><img loading="lazy" src="{html.escape(quote(row.image.replace(os.sep, "/")))}">'
+                     f"<figcaption>{caption}</figcaption></figure>")
+
+    page = (
+        "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+        "<title>Token F0 contours</title><style>"
+        "body{font-family:sans-serif;margin:1em}"
+        ".grid{display:grid;grid-template-columns:repeat(auto-fill,minmax(200px,1fr));gap:8px}"
+        "figure{margin:0;text-align:center;font-size:12px}img{width:100%}"
+        "</style></head><body>\n"
+        f"<h1>Token F0 contours ({len(tokens)} tokens)</h1>\n<div class=\"grid\">\n"
+        + "\n".join(cells) + "\n</div></body></html>\n"
+    )
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(page)
+
+
+def speaker_registers(df: pd.DataFrame, registers_csv: str = REGISTERS_CSV) -> dict:
+    """
+    speaker -> (log10 lower register, log10 register range) used for the
+    T-values of df: from registers_csv if it exists and lists the speaker,
+    otherwise the global f0_mean min / max.
+    """
+    all_f0 = df["f0_mean"].replace(0, np.nan).dropna()
+    log_b = math.log10(all_f0.min())
+    log_range = math.log10(all_f0.max()) - log_b
+    registers = {str(s): (log_b, log_range) for s in df["speaker"].unique()}
+
+    if os.path.exists(registers_csv):
+        table = pd.read_csv(registers_csv)
+        for row in table.itertuples(index=False):
+            if str(row.speaker) in registers:
+                low = math.log10(row.register_low)
+                registers[str(row.speaker)] = (low, math.log10(row.register_high) - low)
+
+        # A registers file left over from another run would misplace the contours
+        speakers = df["speaker"].astype(str)
+        low = speakers.map({s: r[0] for s, r in registers.items()}).to_numpy(np.float64)
+        span = speakers.map({s: r[1] for s, r in registers.items()}).to_numpy(np.float64)
+        f0 = df["f0_mean"].to_numpy(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            T = np.where(f0 > 0, 5 * (np.log10(f0) - low) / span, np.nan)
+        if np.nanmax(np.abs(T - df["T_mean"].to_numpy(np.float64)), initial=0.0) > 0.01:
+            print(f"⚠ {registers_csv} does not match the T-values of the input; "
+                  "contours may be offset from T_start / T_mean / T_end.")
+    return registers
+
+
+def render_token_contours(df: pd.DataFrame, out_dir: str = OUTPUT_DIR,
+                          audio_dir: str = extract.AUDIO_DIR, n_jobs: int = N_JOBS,
+                          registers_csv: str = REGISTERS_CSV) -> pd.DataFrame:
+    """
+    Render a thumbnail for every token whose speaker has audio and write
+    the contact sheet. Returns the rendered tokens with an `image` column.
+    """
+    registers = speaker_registers(df, registers_csv)
+
+    tokens = df[["speaker", "syllable", "t_start", "t_end",
+                 "T_start", "T_mean", "T_end", "tone_5deg"]].copy()
+    tokens["speaker"] = tokens["speaker"].astype(str)
+    tokens["syllable"] = tokens["syllable"].astype(str)
+    tokens.insert(0, "row", np.arange(len(tokens)))
+
+    settings = extract.speaker_pitch_settings(tokens["speaker"].unique())
+    tasks, rendered = [], []
+    for speaker, group in tokens.groupby("speaker", sort=True):
+        audio_path = os.path.join(audio_dir, speaker + ".wav")
+        if not os.path.exists(audio_path):
+            print(f"⚠ No audio for {speaker}; skipping {len(group)} tokens.")
+            continue
+        os.makedirs(os.path.join(out_dir, speaker), exist_ok=True)
+        floor, ceiling = settings[speaker]
+        records = group.to_dict("records")
+        for i in range(0, len(records), TOKENS_PER_TASK):
+            tasks.append((audio_path, floor, ceiling, registers[speaker],
+                          records[i:i + TOKENS_PER_TASK], out_dir))
+        rendered.append(group)
+
+    if not tasks:
+        print("No tokens with audio to render.")
+        return tokens.iloc[:0].assign(image=[])
+
+    if n_jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as pool:
+            parts = list(pool.map(_render_task, tasks))
+    else:
+        parts = [_render_task(t) for t in tasks]
+
+    rendered = pd.concat(rendered)
+    rendered["image"] = [p for part in parts for p in part]
+    write_index(rendered, os.path.join(out_dir, os.path.basename(INDEX_HTML)))
+    return rendered
+
+
+def main():
+    rendered = render_token_contours(pd.read_csv(INPUT_CSV), n_jobs=N_JOBS)
+    if len(rendered):
+        print(f"\n✅ Rendered {len(rendered)} token thumbnails into {OUTPUT_DIR}")
+        print(f"Contact sheet: {INDEX_HTML}")
+
+
+if __name__ == "__main__":
+    main()
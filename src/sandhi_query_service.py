@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 22:31:07 2026
+
+@author: xuechandai
+"""
+
+"""
+Local HTTP/JSON service for sandhi predictions.
+
+Loads sandhi_prob_model.csv (Step 8) and the kinship citation lexicon once,
+compiles them into dense (citation x position x surface) arrays and answers
+queries such as "what surface tone does 姑 take in position 2?":
+
+    GET  /predict?char=姑&position=2&mode=argmax
+    GET  /predict?citation=1&position=2&mode=sample&n=5
+    POST /predict   {"char": "姑", "position": 2, "mode": "distribution"}
+    POST /predict   {"queries": [{...}, {...}, ...]}          (batch)
+    GET  /health
+
+mode is "distribution" (default), "argmax" or "sample" (n draws). A batch
+is answered with one vectorized lookup / draw for all of its queries.
+Requests with more than MAX_BATCH queries or MAX_TOTAL_SAMPLES draws in
+total are rejected with 400.
+
+The model file's modification time is checked at most every
+RELOAD_INTERVAL seconds; when it changed, the model is reloaded and
+swapped in without restarting the server. Connections are kept alive
+(HTTP/1.1), so clients that reuse a connection skip the TCP handshake.
+
+    python src/sandhi_query_service.py [port]
+    python src/load_test_query_service.py           # throughput / latency
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import pandas as pd
+
+from build_sandhi_model import CITATIONS, POSITIONS, OUTPUT_CSV as MODEL_CSV
+from derive_sandhi_with_manual_tones import CITATION_TONES
+
+
+HOST = "127.0.0.1"
+PORT = 8765
+RELOAD_INTERVAL = 1.0
+MAX_SAMPLES = 10000          # draws per query
+MAX_BATCH = 1000             # queries per request
+MAX_TOTAL_SAMPLES = 100000   # draws per request
+
+MODES = ("distribution", "argmax", "sample")
+
+# ======================================================
+
+
+class CompiledModel:
+    """Dense arrays for P(surface | citation, position) from a model table."""
+
+    def __init__(self, prob: pd.DataFrame, lexicon=CITATION_TONES):
+        self.lexicon = dict(lexicon)
+        self.surfaces = np.unique(prob["surface_tone"].to_numpy(dtype=int))
+
+        c = np.searchsorted(CITATIONS, prob["citation_tone"].to_numpy(dtype=int))
+        p = np.searchsorted(POSITIONS, prob["index"].to_numpy(dtype=int))
+        k = np.searchsorted(self.surfaces, prob["surface_tone"].to_numpy(dtype=int))
+        self.probs = np.zeros((len(CITATIONS), len(POSITIONS), len(self.surfaces)))
+        self.probs[c, p, k] = prob["prob"].to_numpy(dtype=float)
+
+        self.known = self.probs.sum(axis=-1) > 0
+        self.cdf = np.cumsum(self.probs, axis=-1)
+        # Guard against rounding so a uniform draw never falls past the end
+        self.cdf[..., -1] = np.where(self.known, np.inf, 0.0)
+        self.best = self.probs.argmax(axis=-1)
+
+    @classmethod
+    def from_csv(cls, path: str = MODEL_CSV) -> "CompiledModel":
+        return cls(pd.read_csv(path))
+
+    def resolve(self, query: dict):
+        """(citation index, position index) of one query; ValueError if invalid."""
+        if "char" in query:
+            char = str(query["char"])
+            if char not in self.lexicon:
+                raise ValueError(f"Unknown character {char!r}.")
+            citation = self.lexicon[char]
+        elif "citation" in query:
+            citation = int(query["citation"])
+        else:
+            raise ValueError("Query needs 'char' or 'citation'.")
+        position = int(query.get("position", 0))
+
+        if citation not in CITATIONS:
+            raise ValueError(f"Citation tone must be one of {CITATIONS}.")
+        if position not in POSITIONS:
+            raise ValueError(f"Position must be one of {POSITIONS}.")
+        c, p = CITATIONS.index(citation), POSITIONS.index(position)
+        if not self.known[c, p]:
+            raise ValueError(f"No probabilities for citation tone {citation}, position {position}.")
+        return c, p
+
+    def answer(self, queries, rng) -> list:
+        """
+        Answer a list of query dicts; invalid ones get {"error": ...}.
+        ValueError if the batch exceeds MAX_BATCH queries or MAX_TOTAL_SAMPLES draws.
+        """
+        if len(queries) > MAX_BATCH:
+            raise ValueError(f"A batch may hold at most {MAX_BATCH} queries.")
+        results = [None] * len(queries)
+        cells, modes, sizes, valid = [], [], [], []
+
+        for i, query in enumerate(queries):
+            try:
+                if not isinstance(query, dict):
+                    raise ValueError("Each query must be a JSON object.")
+                mode = query.get("mode", "distribution")
+                if mode not in MODES:
+                    raise ValueError(f"mode must be one of {MODES}.")
+                n = int(query.get("n", 1)) if mode == "sample" else 0
+                if mode == "sample" and not 0 < n <= MAX_SAMPLES:
+                    raise ValueError(f"n must be between 1 and {MAX_SAMPLES}.")
+                cells.append(self.resolve(query))
+            except (TypeError, ValueError) as err:
+                results[i] = {"error": str(err)}
+                continue
+            modes.append(mode)
+            sizes.append(n)
+            valid.append(i)
+
+        if not valid:
+            return results
+
+        c, p = np.array(cells).T
+        sizes = np.array(sizes)
+        if sizes.sum() > MAX_TOTAL_SAMPLES:
+            raise ValueError(f"A request may draw at most {MAX_TOTAL_SAMPLES} samples in total.")
+
+        # All samples of the batch in one draw
+        draw_c, draw_p = np.repeat(c, sizes), np.repeat(p, sizes)
+        u = rng.random(len(draw_c))
+        drawn = (self.cdf[draw_c, draw_p] < u[:, None]).sum(axis=1)
+        drawn = np.split(self.surfaces[drawn], np.cumsum(sizes)[:-1])
+
+        best = self.best[c, p]
+        for j, i in enumerate(valid):
+            query = queries[i]
+            out = {"citation_tone": CITATIONS[c[j]], "position": POSITIONS[p[j]]}
+            if "char" in query:
+                out["char"] = query["char"]
+            if modes[j] == "distribution":
+                row = self.probs[c[j], p[j]]
+                out["distribution"] = {str(s): float(q) for s, q in zip(self.surfaces, row) if q > 0}
+            elif modes[j] == "argmax":
+                out["surface_tone"] = int(self.surfaces[best[j]])
+                out["prob"] = float(self.probs[c[j], p[j], best[j]])
+            else:
+                out["samples"] = drawn[j].tolist()
+            results[i] = out
+        return results
+
+
+class ModelHolder:
+    """Current CompiledModel, reloaded when the model file changes."""
+
+    def __init__(self, path: str = MODEL_CSV, reload_interval: float = RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.lock = threading.Lock()
+        self.version = 0
+        self._stamp = None
+        self._checked = 0.0
+        self.model = None
+        self.reload()
+
+    def _file_stamp(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def reload(self):
+        stamp = self._file_stamp()
+        model = CompiledModel.from_csv(self.path)
+        self.model, self._stamp = model, stamp
+        self.version += 1
+        print(f"Loaded model v{self.version} from {self.path}")
+
+    def get(self) -> CompiledModel:
+        now = time.monotonic()
+        if now - self._checked >= self.reload_interval and self.lock.acquire(blocking=False):
+            try:
+                self._checked = now
+                if self._file_stamp() != self._stamp:
+                    self.reload()
+            except (OSError, ValueError, KeyError) as err:
+                # Half-written or missing file: keep serving the old model
+                print(f"⚠ Reload failed, keeping model v{self.version}: {err}")
+            finally:
+                self.lock.release()
+        return self.model
+
+
+_thread_state = threading.local()
+
+
+def _thread_rng():
+    if not hasattr(_thread_state, "rng"):
+        _thread_state.rng = np.random.default_rng()
+    return _thread_state.rng
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY the
+    # body waits for the client's delayed ACK (~40 ms per request).
+    disable_nagle_algorithm = True
+    holder = None  # set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _answer(self, payload):
+        model = self.holder.get()
+        if isinstance(payload, dict) and "queries" in payload:
+            if not isinstance(payload["queries"], list):
+                return self._send_json(400, {"error": "'queries' must be a list."})
+            try:
+                results = model.answer(payload["queries"], _thread_rng())
+            except ValueError as err:
+                return self._send_json(400, {"error": str(err)})
+            return self._send_json(200, {"results": results})
+
+        result = model.answer([payload], _thread_rng())[0]
+        self._send_json(400 if "error" in result else 200, result)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            return self._send_json(200, {"status": "ok", "model_version": self.holder.version})
+        if url.path != "/predict":
+            return self._send_json(404, {"error": f"Unknown path {url.path}."})
+        # http.server decodes the request line as latin-1; undo that so raw
+        # UTF-8 (curl 'http://.../predict?char=姑') works as well as %-encoding
+        try:
+            raw = url.query.encode("latin-1").decode("utf-8")
+        except UnicodeError:
+            raw = url.query
+        query = {k: v[-1] for k, v in parse_qs(raw).items()}
+        self._answer(query)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/predict":
+            return self._send_json(404, {"error": f"Unknown path {self.path}."})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            # The body cannot be skipped reliably, so drop the connection after replying
+            self.close_connection = True
+            return self._send_json(400, {"error": "Invalid Content-Length header."})
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as err:
+            return self._send_json(400, {"error": f"Invalid JSON: {err}"})
+        self._answer(payload)
+
+
+def make_server(host: str = HOST, port: int = PORT, model_path: str = MODEL_CSV):
+    handler = type("Handler", (QueryHandler,), {"holder": ModelHolder(model_path)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(host: str = HOST, port: int = PORT, model_path: str = MODEL_CSV):
+    server = make_server(host, port, model_path)
+    print(f"✅ Sandhi query service on http://{host}:{server.server_port}/predict")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    serve(HOST, port)
+
+
+if __name__ == "__main__":
+    main()
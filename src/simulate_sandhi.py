@@ -10,29 +10,74 @@ import os
 import pandas as pd
 import numpy as np
 
-PROJECT_ROOT = "/Users/xuechandai/Desktop/guiyang_tone_sandi"
-os.chdir(PROJECT_ROOT)
 
-prob = pd.read_csv("data/processed/sandhi_prob_model.csv")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-def sample_surface(citation, position):
-    """Randomly draw a surface tone from P(surface|citation,position)."""
+MODEL_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "sandhi_prob_model.csv")
+OUTPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "sandhi_simulation.csv")
+
+N = 5000
+
+# Set to a speaker name to simulate from their table of the hierarchical
+# model (sandhi_hier_speakers.csv); MODEL_CSV is then ignored.
+SPEAKER = None
+
+
+def sample_surface(prob, citation, position, size=None, rng=np.random):
+    """Randomly draw surface tone(s) from P(surface|citation,position)."""
     subset = prob[(prob["citation_tone"] == citation) & (prob["index"] == position)]
+    if subset.empty:
+        raise ValueError(f"No probabilities for citation tone {citation}, position {position}.")
     tones = subset["surface_tone"].values
     probs = subset["prob"].values
-    return np.random.choice(tones, p=probs)
+    return rng.choice(tones, size=size, p=probs)
 
-N = 5000
-sim_data = []
 
-for _ in range(N):
-    citation = np.random.choice([1,2,3,4])   # random citation tone
-    pos      = np.random.choice([1,2])       # A1 or A2
-    surface  = sample_surface(citation, pos)
-    sim_data.append((citation, pos, surface))
+def simulate_sandhi(prob: pd.DataFrame, n: int = N, seed=None, speaker=None) -> pd.DataFrame:
+    """
+    Monte Carlo simulation of AA sandhi: draw a random citation tone and
+    position for each of n tokens, then a surface tone from the model.
+
+    prob is a sandhi_prob_model.csv-style table (pooled model or the
+    hierarchical population table). For the per-speaker table of the
+    hierarchical model, pass the speaker to simulate.
+    """
+    if "speaker" in prob.columns:
+        if speaker is None:
+            raise ValueError("Per-speaker model table: choose a speaker to simulate.")
+        prob = prob[prob["speaker"] == speaker]
+        if prob.empty:
+            raise ValueError(f"Speaker {speaker!r} not in the model table.")
+
+    rng = np.random.default_rng(seed)
+
+    citation = rng.choice([1, 2, 3, 4], size=n)   # random citation tone
+    pos      = rng.choice([1, 2], size=n)         # A1 or A2
+    surface  = np.empty(n, dtype=int)
+
+    # One draw per (citation, position) cell instead of one per token
+    for c in np.unique(citation):
+        for p in np.unique(pos):
+            cell = (citation == c) & (pos == p)
+            if cell.any():
+                surface[cell] = sample_surface(prob, c, p, size=cell.sum(), rng=rng)
+
+    return pd.DataFrame({"citation": citation, "position": pos, "surface": surface})
+
+
+def main():
+    if SPEAKER is None:
+        prob = pd.read_csv(MODEL_CSV)
+    else:
+        from fit_hierarchical_sandhi_model import SPEAKERS_CSV
+        prob = pd.read_csv(SPEAKERS_CSV)
+
+    sim_df = simulate_sandhi(prob, N, speaker=SPEAKER)
+    sim_df.to_csv(OUTPUT_CSV, index=False)
+
+    print(f"\nSimulation complete. Saved to {OUTPUT_CSV}")
+    print(sim_df.head())
 
-sim_df = pd.DataFrame(sim_data, columns=["citation","position","surface"])
-sim_df.to_csv("data/processed/sandhi_simulation.csv", index=False)
 
-print("\nSimulation complete. Saved to data/processed/sandhi_simulation.csv")
-print(sim_df.head())
+if __name__ == "__main__":
+    main()
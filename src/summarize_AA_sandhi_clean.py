@@ -9,42 +9,62 @@ Created on Tue Dec  9 13:10:06 2025
 import os
 import pandas as pd
 
-os.chdir("/Users/xuechandai/Desktop/guiyang_tone_sandi")
 
-# Load enriched data
-df = pd.read_csv("data/processed/kinship_tones_with_sandhi_info.csv")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "kinship_tones_with_sandhi_info.csv")
+OUTPUT_CHAR_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "AA_sandhi_summary_char.csv")
+OUTPUT_GLOBAL_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "AA_sandhi_summary_global.csv")
 
 # Define kinship characters only (AA set)
 KINSHIP = ["爸","妈","姐","妹","哥","弟","爷","奶","公","姑","叔","婆","祖","舅","伯"]
 
-# Keep only AA positions AND kinship characters
-AA = df[
-    df["base_label"].isin(KINSHIP) & 
-    df["index"].isin([1,2])
-].copy()
-
-print("\n=== Clean AA Sandhi Dataset ===")
-print(AA.head())
-
-# 1. Per-character AA pattern
-summary_char = (
-    AA.groupby(["base_label","index"])[["citation_tone","surface_tone"]]
-      .agg(lambda x: x.value_counts().index[0])
-      .reset_index()
-)
-print("\n=== AA Sandhi Summary by Character & Position ===")
-print(summary_char)
-
-summary_char.to_csv("data/processed/AA_sandhi_summary_char.csv", index=False, encoding="utf-8-sig")
-
-# 2. Global AA sandhi pattern (tone category × position)
-summary_global = (
-    AA.groupby(["citation_tone","index","surface_tone"])
-      .size()
-      .reset_index(name="count")
-)
-
-print("\n=== Global AA Sandhi Pattern (Counts) ===")
-print(summary_global)
-
-summary_global.to_csv("data/processed/AA_sandhi_summary_global.csv", index=False, encoding="utf-8-sig")
+
+def summarize_aa_sandhi(df: pd.DataFrame):
+    """
+    Summarize the enriched data (kinship_tones_with_sandhi_info) into
+    (summary_char, summary_global).
+    """
+    # Keep only AA positions AND kinship characters
+    AA = df[
+        df["base_label"].isin(KINSHIP) &
+        df["index"].isin([1,2])
+    ].copy()
+
+    print("\n=== Clean AA Sandhi Dataset ===")
+    print(AA.head())
+
+    # 1. Per-character AA pattern
+    summary_char = (
+        AA.groupby(["base_label","index"])[["citation_tone","surface_tone"]]
+          .agg(lambda x: x.value_counts().index[0])
+          .reset_index()
+    )
+    print("\n=== AA Sandhi Summary by Character & Position ===")
+    print(summary_char)
+
+    # 2. Global AA sandhi pattern (tone category × position)
+    summary_global = (
+        AA.groupby(["citation_tone","index","surface_tone"])
+          .size()
+          .reset_index(name="count")
+    )
+
+    print("\n=== Global AA Sandhi Pattern (Counts) ===")
+    print(summary_global)
+
+    return summary_char, summary_global
+
+
+def main():
+    # Load enriched data
+    df = pd.read_csv(INPUT_CSV)
+
+    summary_char, summary_global = summarize_aa_sandhi(df)
+
+    summary_char.to_csv(OUTPUT_CHAR_CSV, index=False, encoding="utf-8-sig")
+    summary_global.to_csv(OUTPUT_GLOBAL_CSV, index=False, encoding="utf-8-sig")
+
+
+if __name__ == "__main__":
+    main()
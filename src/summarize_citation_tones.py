@@ -10,17 +10,15 @@ import os
 import pandas as pd
 import numpy as np
 
-# Optionally ensure execution from project root (modify if needed)
-os.chdir("/Users/xuechandai/Desktop/guiyang_tone_sandi")
 
-# 1. Load the dataset with 5-degree tone labels
-df = pd.read_csv("data/processed/f0_with_T_values_labeled.csv")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# Ensure tone labels are treated as strings
-df["tone_5deg"] = df["tone_5deg"].astype(str)
+INPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "f0_with_T_values_labeled.csv")
+OUTPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "citation_tone_summary.csv")
 
-# 2. Define citation-tone groups (single-syllable citation tones)
-tone_groups = {
+
+# Citation-tone groups (single-syllable citation tones)
+TONE_GROUPS = {
     "Tone1": ["妈", "花", "高", "多", "天"],
     "Tone2": ["麻", "头", "牛", "人", "狼"],
     "Tone3": ["马", "你", "我", "米", "水"],
@@ -44,59 +42,84 @@ def tone_change(tone_str: str) -> int:
     return abs(int(s[0]) - int(s[1]))
 
 
-results = []
+def summarize_citation_tones(df: pd.DataFrame, tone_groups=TONE_GROUPS,
+                             verbose: bool = True) -> pd.DataFrame:
+    """
+    Select one citation tone (5-degree label) per tone group from the
+    monosyllabic tokens in df (columns: syllable, tone_5deg).
+    """
+    df = df.copy()
 
-for tone_name, chars in tone_groups.items():
+    # Ensure tone labels are treated as strings
+    df["tone_5deg"] = df["tone_5deg"].astype(str)
 
-    subset = df[df["syllable"].isin(chars)].copy()
-    subset = subset.dropna(subset=["tone_5deg"])
+    results = []
 
-    if subset.empty:
-        print(f"{tone_name}: no tokens found for {chars}")
-        continue
+    for tone_name, chars in tone_groups.items():
 
-    # 3. Count tone label occurrences within this tone group
-    counts = subset["tone_5deg"].value_counts()
+        subset = df[df["syllable"].isin(chars)].copy()
+        subset = subset.dropna(subset=["tone_5deg"])
 
-    # 3a. Remove outliers: tone labels appearing only once
-    if (counts > 1).any():
-        kept_labels = counts[counts > 1].index
-        subset = subset[subset["tone_5deg"].isin(kept_labels)]
+        if subset.empty:
+            if verbose:
+                print(f"{tone_name}: no tokens found for {chars}")
+            continue
+
+        # Count tone label occurrences within this tone group
         counts = subset["tone_5deg"].value_counts()
 
-    # If all labels were removed as outliers, fall back to the original counts
-    if counts.empty:
-        counts = df[df["syllable"].isin(chars)]["tone_5deg"].value_counts()
+        # Remove outliers: tone labels appearing only once
+        if (counts > 1).any():
+            kept_labels = counts[counts > 1].index
+            subset = subset[subset["tone_5deg"].isin(kept_labels)]
+            counts = subset["tone_5deg"].value_counts()
+
+        # If all labels were removed as outliers, fall back to the original counts
+        if counts.empty:
+            counts = df[df["syllable"].isin(chars)]["tone_5deg"].value_counts()
+
+        if counts.empty:
+            if verbose:
+                print(f"{tone_name}: still empty after fallback; skipping.")
+            continue
+
+        # Determine mode(s)
+        max_count = counts.max()
+        candidates = list(counts[counts == max_count].index)
+
+        # If multiple labels tie, choose the one with the largest contour magnitude
+        if len(candidates) == 1:
+            chosen = candidates[0]
+        else:
+            chosen = max(candidates, key=tone_change)
+
+        candidates_str = [str(c) for c in candidates]
+
+        results.append({
+            "tone_group": tone_name,
+            "characters": "".join(chars),
+            "selected_tone": str(chosen),
+            "candidate_tones": ",".join(candidates_str),
+        })
 
-    if counts.empty:
-        print(f"{tone_name}: still empty after fallback; skipping.")
-        continue
+        if verbose:
+            print(f"{tone_name}: selected {chosen}  (candidates: {candidates_str})")
 
-    # Determine mode(s)
-    max_count = counts.max()
-    candidates = list(counts[counts == max_count].index)
+    return pd.DataFrame(results)
 
-    # If multiple labels tie, choose the one with the largest contour magnitude
-    if len(candidates) == 1:
-        chosen = candidates[0]
-    else:
-        chosen = max(candidates, key=tone_change)
 
-    candidates_str = [str(c) for c in candidates]
+def main():
+    # 1. Load the dataset with 5-degree tone labels
+    df = pd.read_csv(INPUT_CSV)
 
-    results.append({
-        "tone_group": tone_name,
-        "characters": "".join(chars),
-        "selected_tone": str(chosen),
-        "candidate_tones": ",".join(candidates_str),
-    })
+    # 2. Select one citation tone per group
+    out_df = summarize_citation_tones(df)
 
-    print(f"{tone_name}: selected {chosen}  (candidates: {candidates_str})")
+    # 3. Save summary
+    out_df.to_csv(OUTPUT_CSV, index=False, encoding="utf-8-sig")
 
+    print(f"\nCitation tone summary saved to {OUTPUT_CSV}")
 
-# 5. Save summary
-output_path = "data/processed/citation_tone_summary.csv"
-out_df = pd.DataFrame(results)
-out_df.to_csv(output_path, index=False, encoding="utf-8-sig")
 
-print(f"\nCitation tone summary saved to {output_path}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:20:37 2026
+
+@author: xuechandai
+"""
+
+"""
+Parameter sweep for tone labeling.
+
+Evaluates every combination of
+
+    PITCH_FLOOR / PITCH_CEILING   (pitch tracking, extract_f0_from_textgrid.py)
+    level_thresh / max_step       (5-degree labeling, label_tones_5degree.py)
+
+and reports, per setting, how well the labels of the monosyllabic tokens
+agree with the citation tones in citation_tone_summary.csv.
+
+Pitch tracks are cached on disk per pitch setting (data/processed/pitch_cache/),
+so only new floor / ceiling values touch the audio. Each worker process takes
+one pitch setting, computes its T-values once and labels all
+level_thresh / max_step points with the vectorized classifier.
+
+If no audio is available, only the labeling parameters are swept, on the
+T-values already in f0_with_T_values.csv.
+
+Output:
+    data/processed/label_sweep_results.csv
+"""
+
+import os
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import extract_f0_from_textgrid as extract
+from label_tones_5degree import TONE_CODE_LABELS, classify_tone_codes
+from summarize_citation_tones import TONE_GROUPS, summarize_citation_tones
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+F0_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "f0_with_T_values.csv")
+CITATION_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "citation_tone_summary.csv")
+OUTPUT_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "label_sweep_results.csv")
+
+# Sweep grid
+PITCH_FLOOR_GRID = [50.0, 60.0, 75.0, 100.0]
+PITCH_CEILING_GRID = [300.0, 350.0, 400.0, 450.0, 500.0, 600.0]
+LEVEL_THRESH_GRID = [0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 1.75, 2.0]
+MAX_STEP_GRID = [1, 2, 3, 4]
+
+N_JOBS = os.cpu_count() or 1
+
+# ======================================================
+
+
+def load_expected_tones(path: str = CITATION_CSV, tone_groups=TONE_GROUPS):
+    """Map every monosyllabic stimulus to (tone group, expected 5-degree label)."""
+    cit = pd.read_csv(path, dtype={"selected_tone": str})
+    selected = dict(zip(cit["tone_group"], cit["selected_tone"]))
+    return {
+        char: (group, selected[group])
+        for group, chars in tone_groups.items() if group in selected
+        for char in chars
+    }
+
+
+def build_T_table(pairs, pitch_floor: float, pitch_ceiling: float) -> pd.DataFrame:
+    """Token table with T-values for one pitch setting (pitch tracks cached)."""
+    intervals = [extract.read_intervals(tg_path) for _, tg_path in pairs]
+    table = extract.TokenTable(sum(len(iv) for iv in intervals), features=[])
+    for (audio_path, tg_path), pair_intervals in zip(pairs, intervals):
+        extract.process_one_pair(audio_path, tg_path, pitch_floor, pitch_ceiling,
+                                 table=table, intervals=pair_intervals, verbose=False)
+    return extract.compute_T_values(table.to_frame(), verbose=False)
+
+
+def score_labeling(T_df: pd.DataFrame, expected: dict, label_grid):
+    """
+    Label T_df at every (level_thresh, max_step) point and score the
+    monosyllabic tokens against their expected citation tones.
+    """
+    syllables = T_df["syllable"].astype(str).to_numpy()
+    mono_idx = np.flatnonzero(np.isin(syllables, list(expected)))
+    mono_syllables = syllables[mono_idx]
+    groups = np.array([expected[c][0] for c in mono_syllables], dtype=object)
+    target = np.array([expected[c][1] for c in mono_syllables], dtype=object)
+    selected = {group: tone for group, tone in expected.values()}
+
+    Ts, Te, Tm = (T_df[c].to_numpy() for c in ("T_start", "T_end", "T_mean"))
+
+    results = []
+    for level_thresh, max_step in label_grid:
+        codes = classify_tone_codes(Ts, Te, Tm, level_thresh, max_step)
+        labels = TONE_CODE_LABELS[codes[mono_idx]].astype(str)
+        hit = labels == target
+
+        summary = summarize_citation_tones(
+            pd.DataFrame({"syllable": mono_syllables, "tone_5deg": labels}),
+            verbose=False,
+        )
+        matched = sum(selected.get(g) == t for g, t in
+                      zip(summary["tone_group"], summary["selected_tone"]))
+
+        row = {
+            "level_thresh": level_thresh,
+            "max_step": max_step,
+            "agreement": hit.mean() if hit.size else np.nan,
+            "groups_matched": matched,
+            "labeled_fraction": (codes > 0).mean(),
+        }
+        for group in selected:
+            in_group = groups == group
+            row[f"agreement_{group}"] = hit[in_group].mean() if in_group.any() else np.nan
+        results.append(row)
+    return results
+
+
+def _evaluate_pitch_setting(args):
+    pitch_floor, pitch_ceiling, pairs, expected, label_grid = args
+    T_df = build_T_table(pairs, pitch_floor, pitch_ceiling)
+    rows = score_labeling(T_df, expected, label_grid)
+    for row in rows:
+        row.update(pitch_floor=pitch_floor, pitch_ceiling=pitch_ceiling)
+    return rows
+
+
+def run_sweep(pairs=None, expected=None, n_jobs=N_JOBS,
+              floor_grid=PITCH_FLOOR_GRID, ceiling_grid=PITCH_CEILING_GRID,
+              level_grid=LEVEL_THRESH_GRID, step_grid=MAX_STEP_GRID) -> pd.DataFrame:
+    """Evaluate the full grid and return one row per setting, best first."""
+    if pairs is None:
+        pairs = extract.find_pairs()
+    if expected is None:
+        expected = load_expected_tones()
+    label_grid = list(itertools.product(level_grid, step_grid))
+
+    if pairs:
+        tasks = [(f, c, pairs, expected, label_grid)
+                 for f, c in itertools.product(floor_grid, ceiling_grid) if f < c]
+        if n_jobs > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as pool:
+                parts = list(pool.map(_evaluate_pitch_setting, tasks))
+        else:
+            parts = [_evaluate_pitch_setting(t) for t in tasks]
+        rows = [row for part in parts for row in part]
+    else:
+        print("⚠ No audio found; sweeping labeling parameters on existing T-values only.")
+        rows = score_labeling(pd.read_csv(F0_CSV), expected, label_grid)
+        for row in rows:
+            row.update(pitch_floor=extract.PITCH_FLOOR, pitch_ceiling=extract.PITCH_CEILING)
+
+    out = pd.DataFrame(rows)
+    front = ["pitch_floor", "pitch_ceiling", "level_thresh", "max_step"]
+    out = out[front + [c for c in out.columns if c not in front]]
+    return out.sort_values(
+        ["agreement", "groups_matched"], ascending=False, kind="stable"
+    ).reset_index(drop=True)
+
+
+def main():
+    results = run_sweep(n_jobs=N_JOBS)
+    results.to_csv(OUTPUT_CSV, index=False, encoding="utf-8-sig")
+
+    print(f"\n=== Top labeling settings ({len(results)} evaluated) ===")
+    print(results.head(10).round(3).to_string(index=False))
+    print(f"\nSaved sweep results to: {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()